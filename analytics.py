@@ -0,0 +1,123 @@
+import argparse
+import sqlite3
+import sys
+from config import DB_FILE, ANALYTICS_CHUNK_ROWS
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    print("Error: numpy and pandas are required for collection analytics.")
+    print("Please run: pip install numpy pandas")
+    sys.exit(1)
+
+COLUMNS = ['vendor', 'currency', 'price', 'date_acquired', 'library_code',
+           'is_withdrawn', 'is_lost', 'is_damaged', 'is_restricted']
+FLAGS = ['is_withdrawn', 'is_lost', 'is_damaged', 'is_restricted']
+
+
+def chunks_from_db(db_file=DB_FILE, chunk_rows=ANALYTICS_CHUNK_ROWS):
+    conn = sqlite3.connect(db_file)
+    try:
+        sql = f"SELECT {', '.join(COLUMNS)} FROM physical_items"
+        for chunk in pd.read_sql_query(sql, conn, chunksize=chunk_rows):
+            yield chunk
+    finally:
+        conn.close()
+
+def chunks_from_parquet(path, chunk_rows=ANALYTICS_CHUNK_ROWS):
+    """Reads the export_parquet.py dataset, which skips SQLite's per-row tuple decoding."""
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    for batch in dataset.to_batches(columns=COLUMNS, batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+class CollectionStats:
+    """
+    Mergeable aggregates over physical_items, built one chunk at a time.
+    Every step is a groupby or column sum over the whole chunk; no per-row Python.
+    """
+    def __init__(self):
+        self.items = 0
+        self.spend = None          # (currency, vendor) -> [total, items]
+        self.acquired = None       # year -> items
+        self.flags = np.zeros(len(FLAGS), dtype=np.int64)
+        self.by_library = None     # library_code -> [items, *flags]
+
+    @staticmethod
+    def _add(acc, part):
+        return part if acc is None else acc.add(part, fill_value=0)
+
+    def update(self, df):
+        self.items += len(df)
+        # Parquet hands back categoricals and int8 flags; group on plain keys, sum in int64
+        currency = df['currency'].astype(object).fillna('?')
+        vendor = df['vendor'].astype(object).fillna('?')
+        library = df['library_code'].astype(object).fillna('?')
+        flags = df[FLAGS].fillna(0).astype(np.int64)
+
+        priced = df['price'].notna()
+        spend = df['price'][priced].groupby([currency[priced], vendor[priced]]).agg(['sum', 'count'])
+        self.spend = self._add(self.spend, spend)
+
+        # date_acquired is ISO text (or a date from Parquet); the year is its first 4 chars
+        years = pd.to_numeric(df['date_acquired'].astype('string').str[:4], errors='coerce').dropna()
+        self.acquired = self._add(self.acquired, years.astype(np.int64).value_counts())
+
+        self.flags += flags.to_numpy().sum(axis=0)
+        lib = flags.groupby(library).sum()
+        lib.insert(0, 'items', library.groupby(library).size())
+        self.by_library = self._add(self.by_library, lib)
+
+    def merge(self, other):
+        self.items += other.items
+        self.spend = self._add(self.spend, other.spend) if other.spend is not None else self.spend
+        self.acquired = self._add(self.acquired, other.acquired) if other.acquired is not None else self.acquired
+        self.flags += other.flags
+        self.by_library = self._add(self.by_library, other.by_library) if other.by_library is not None else self.by_library
+
+    def rates(self):
+        """Loss / damage / withdrawal rates, overall and per library_code."""
+        overall = pd.Series(self.flags / max(self.items, 1), index=FLAGS)
+        per_lib = None
+        if self.by_library is not None:
+            per_lib = self.by_library[FLAGS].div(self.by_library['items'].clip(lower=1), axis=0)
+        return overall, per_lib
+
+
+def collect(chunks):
+    stats = CollectionStats()
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats
+
+def print_report(stats, top=20):
+    print(f"=== COLLECTION ANALYTICS ({stats.items} holdings) ===")
+    if stats.spend is not None:
+        spend = stats.spend.astype({'count': np.int64}).sort_values('sum', ascending=False)
+        print("\n--- SPEND BY CURRENCY ---")
+        print(spend.groupby(level=0).sum().to_string())
+        print(f"\n--- SPEND BY CURRENCY / VENDOR (Top {top}) ---")
+        print(spend.head(top).to_string())
+    if stats.acquired is not None:
+        print("\n--- ACQUISITIONS PER YEAR ---")
+        print(stats.acquired.sort_index().astype(np.int64).to_string())
+    overall, per_lib = stats.rates()
+    print("\n--- STATUS RATES ---")
+    print(overall.map("{:.2%}".format).to_string())
+    if per_lib is not None:
+        print("\n--- STATUS RATES BY LIBRARY ---")
+        print(per_lib.map("{:.2%}".format).to_string())
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Vectorized collection statistics over physical_items.")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--parquet', help="Read an export_parquet.py dataset directory instead of SQLite")
+    ap.add_argument('--chunk-rows', type=int, default=ANALYTICS_CHUNK_ROWS)
+    args = ap.parse_args()
+    if args.parquet:
+        source = chunks_from_parquet(f"{args.parquet}/physical_items", args.chunk_rows)
+    else:
+        source = chunks_from_db(args.db, args.chunk_rows)
+    print_report(collect(source))
@@ -0,0 +1,169 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from config import INPUT_FILE, DB_FILE, PARSE_CACHE_DIR, PARSE_WORKERS, SHARD_DIR, BUILD_PAGE_SIZE, BUILD_MIN_RATIO
+from database import INDEXES
+from main import run_migration
+from shard import merge_shards, shard_files
+from summary import trigger_names
+
+
+def optimize(src, dest, page_size=BUILD_PAGE_SIZE):
+    """ANALYZE, then VACUUM INTO a defragmented copy with the given page size (statistics included)."""
+    conn = sqlite3.connect(src)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.execute(f"PRAGMA page_size = {int(page_size)}")
+    conn.execute("VACUUM INTO ?", (dest,))
+    conn.close()
+
+def validate(path, live=None, min_ratio=BUILD_MIN_RATIO):
+    """
+    Reasons not to publish `path`; empty when it looks sound. Besides the
+    integrity checks, a build with far fewer biblios than the live database
+    is refused (e.g. a truncated export).
+    """
+    problems = []
+    conn = sqlite3.connect(path)
+    try:
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != 'ok':
+            problems.append(f"quick_check: {check}")
+        if conn.execute("PRAGMA foreign_key_check").fetchone():
+            problems.append("items without a biblio")
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        missing = [name for name, _, _ in INDEXES if name not in indexes]
+        if missing:
+            problems.append(f"missing indexes: {', '.join(missing)}")
+        if not trigger_names(conn):
+            problems.append("summary triggers missing")
+        biblios = conn.execute("SELECT COUNT(*) FROM biblio_master").fetchone()[0]
+    finally:
+        conn.close()
+    if biblios == 0:
+        problems.append("no biblio records")
+    if live and os.path.exists(live):
+        conn = sqlite3.connect(f"file:{live}?mode=ro", uri=True)
+        try:
+            old = conn.execute("SELECT COUNT(*) FROM biblio_master").fetchone()[0]
+        except sqlite3.OperationalError:
+            old = 0  # Not a migrated database yet
+        conn.close()
+        if biblios < old * min_ratio:
+            problems.append(f"{biblios} biblios against {old} in {live} (below {min_ratio:.0%})")
+    return problems
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def check_no_journal(db_file):
+    """
+    A journal only exists while a transaction is open (or after a crash), so
+    this doesn't keep writers away; it stops SQLite from taking the journal
+    for the new file's and "rolling it back" into the published database.
+    """
+    for suffix in ('-journal', '-wal'):
+        if os.path.exists(db_file + suffix):
+            raise ValueError(f"{db_file}{suffix} exists: a transaction is open or was interrupted; retry")
+
+def publish(ready, db_file):
+    """
+    Atomically renames `ready` over `db_file`. Connections already open keep
+    reading the old file, whose inode lives on until they close it; new
+    connections get the new one. The old file stays reachable as
+    <db_file>.prev (a hard link, no copy) for rolling back.
+    A writer that keeps its connection would go on committing into the old
+    file: watch.py checks for the swap and replays from the new database's
+    ingest offset; other writers (reparse.py, inventory.py) must not run across
+    a swap.
+    """
+    check_no_journal(db_file)
+    fsync_path(ready)
+    if os.path.exists(db_file):
+        prev = db_file + '.prev'
+        if os.path.exists(prev): os.remove(prev)
+        os.link(db_file, prev)
+    os.replace(ready, db_file)
+    if os.name == 'posix':
+        fsync_path(os.path.dirname(os.path.abspath(db_file)))  # Make the rename itself durable
+
+def rollback(db_file):
+    prev = db_file + '.prev'
+    if not os.path.exists(prev):
+        raise ValueError(f"no previous database ({prev}) to roll back to")
+    check_no_journal(db_file)
+    os.replace(prev, db_file)
+
+def build(input_file=INPUT_FILE, db_file=DB_FILE, normalized=None, compact=None, cache_dir=None,
+          shards=None, workers=PARSE_WORKERS, page_size=BUILD_PAGE_SIZE, min_ratio=BUILD_MIN_RATIO):
+    """
+    Blue/green build: migrates (or, with `shards`, merges that directory's shard
+    databases) into <db_file>.build while readers keep using `db_file`, optimizes
+    it into <db_file>.new, validates that, and publishes it with one atomic
+    rename. A build that fails validation is left as <db_file>.new for a look.
+    """
+    staging, ready = db_file + '.build', db_file + '.new'
+    for path in (staging, staging + '-journal', ready):
+        if os.path.exists(path): os.remove(path)  # Leftovers of an interrupted build
+
+    if shards is not None:
+        print(f"Merging the shards in {shards} into {staging}...")
+        merge_shards(staging, shard_files([], shards), normalized, compact)
+    else:
+        run_migration(normalized=normalized, compact=compact, input_file=input_file, cache_dir=cache_dir,
+                      db_file=staging, workers=workers)
+    if not os.path.exists(staging):
+        raise ValueError("nothing was built")
+
+    t0 = time.perf_counter()
+    optimize(staging, ready, page_size)
+    size_before, size_after = os.path.getsize(staging), os.path.getsize(ready)
+    os.remove(staging)
+    print(f"\nOptimized (ANALYZE, VACUUM INTO, {page_size}-byte pages): "
+          f"{size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB in {time.perf_counter() - t0:.2f}s")
+
+    t0 = time.perf_counter()
+    problems = validate(ready, db_file, min_ratio)
+    if problems:
+        raise ValueError(f"{ready} failed validation, {db_file} left unchanged:\n  " + "\n  ".join(problems))
+    print(f"Validated in {time.perf_counter() - t0:.2f}s")
+    publish(ready, db_file)
+    print(f"Published {db_file} (previous version kept as {db_file}.prev)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build the database off to the side and swap it in atomically.")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE,
+                    help="JSONL export (optionally .gz / .xz / .zst), or a directory / glob of them")
+    ap.add_argument('--db', default=DB_FILE, help="Live database to replace")
+    ap.add_argument('--normalized', action='store_true', default=None,
+                    help="Build with lookup tables for low-cardinality columns")
+    ap.add_argument('--compact', action='store_true', default=None, help="Build with integer dates and prices")
+    ap.add_argument('--cache', nargs='?', const=PARSE_CACHE_DIR, metavar='DIR',
+                    help=f"Save parsed rows to DIR (default {PARSE_CACHE_DIR}), or load them if already there")
+    ap.add_argument('--shards', nargs='?', const=SHARD_DIR, metavar='DIR',
+                    help=f"Merge the shard databases in DIR (default {SHARD_DIR}) instead of migrating")
+    ap.add_argument('--workers', type=int, default=PARSE_WORKERS)
+    ap.add_argument('--page-size', type=int, default=BUILD_PAGE_SIZE)
+    ap.add_argument('--force', action='store_true',
+                    help=f"Publish even with fewer than {BUILD_MIN_RATIO:.0%} of the live database's biblios")
+    ap.add_argument('--rollback', action='store_true', help="Swap the previous database back in instead")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        if args.rollback:
+            rollback(args.db)
+            print(f"Rolled {args.db} back to the previous build")
+        else:
+            build(args.input, args.db, args.normalized, args.compact, args.cache, args.shards, args.workers,
+                  args.page_size, 0 if args.force else BUILD_MIN_RATIO)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
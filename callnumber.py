@@ -0,0 +1,88 @@
+import argparse
+import re
+from config import DB_FILE
+from database import init_db
+
+# "657.8:K45" -> class 657, decimal 8, cutter K45 (colon or space separated).
+# Longer digit runs ("2010", "1234.5") aren't Dewey classes.
+DEWEY = re.compile(r'^\s*(\d{1,3})(?!\d)(?:\.(\d*))?\s*[:/ ]?\s*(.*?)\s*$')
+DECIMAL_WIDTH = 10
+SHELF_END = '~'  # Sorts after every character a key can contain
+
+
+def call_number_key(raw):
+    """
+    Fixed-width key whose plain string order is shelf order:
+    "5.1" -> "005.1000000000", "657.8:K45" -> "657.8000000000 K45".
+    Non-Dewey call numbers sort after all Dewey ones, in text order.
+    """
+    if not raw or not raw.strip(): return None
+    match = DEWEY.match(raw)
+    if not match:
+        return "X " + raw.strip().upper()
+    whole, decimal, cutter = match.groups()
+    key = f"{int(whole):03d}.{(decimal or '')[:DECIMAL_WIDTH]:0<{DECIMAL_WIDTH}}"
+    cutter = re.sub(r'[^A-Z0-9.]+', ' ', cutter.upper()).strip()
+    return f"{key} {cutter}" if cutter else key
+
+def shelf_bounds(low, high):
+    """Key range covering call numbers low..high inclusive, cutters included."""
+    return call_number_key(low), call_number_key(high) + SHELF_END
+
+def shelf_list(conn, low, high, library_code=None, shelving_location=None):
+    """
+    Yields (item_id, barcode, call_number, shelving_location, library_code) in
+    shelf order for call numbers low..high, e.g. shelf_list(conn, "500", "599.99").
+    Served by one range scan on idx_items_shelf (or idx_items_call_key).
+    """
+    where, params = [], []
+    for column, value in (("library_code", library_code), ("shelving_location", shelving_location)):
+        if value is not None:
+            where.append(f"{column} = ?"); params.append(value)
+    where.append("call_number_key BETWEEN ? AND ?")
+    params.extend(shelf_bounds(low, high))
+    cursor = conn.execute(
+        "SELECT item_id, barcode, call_number, shelving_location, library_code "
+        f"FROM physical_items WHERE {' AND '.join(where)} ORDER BY call_number_key", params)
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows: break
+        yield from rows
+
+def backfill_keys(conn, recompute=False):
+    """
+    Fills call_number_key for rows migrated before the column existed. With
+    `recompute`, also corrects every stored key that call_number_key() would
+    now compute differently (after a change to the key format).
+    """
+    conn.create_function("call_number_key", 1, call_number_key, deterministic=True)
+    before = conn.total_changes  # Unlike rowcount, also counts writes made by view triggers
+    where = ("call_number_key IS NOT call_number_key(call_number)" if recompute else
+             "call_number_key IS NULL AND call_number_key(call_number) IS NOT NULL")
+    conn.execute(f"UPDATE physical_items SET call_number_key = call_number_key(call_number) WHERE {where}")
+    conn.commit()
+    return conn.total_changes - before
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shelf list by call-number range, in shelf order.")
+    ap.add_argument('low', nargs='?', help="First call number, e.g. 500")
+    ap.add_argument('high', nargs='?', help="Last call number (inclusive), e.g. 599.99")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--library')
+    ap.add_argument('--location')
+    ap.add_argument('--backfill', action='store_true', help="Compute keys for existing rows first")
+    ap.add_argument('--recompute', action='store_true',
+                    help="With --backfill, also rewrite existing keys that are out of date")
+    args = ap.parse_args()
+
+    conn = init_db(args.db)
+    if args.backfill:
+        print(f"Backfilled {backfill_keys(conn, args.recompute)} call-number keys")
+    if args.low and args.high:
+        n = 0
+        for item_id, barcode, call_number, location, library in shelf_list(
+                conn, args.low, args.high, args.library, args.location):
+            print(f"{call_number or '':<20} {barcode or '':<12} {library or '':<6} {location or ''}")
+            n += 1
+        print(f"{n} items")
+    conn.close()
@@ -1,4 +1,5 @@
 import re
+import os
 
 # --- REGEX PATTERNS ---
 PATTERNS = {
@@ -18,4 +19,60 @@ PATTERNS = {
 }
 
 INPUT_FILE = 'library_data.jsonl'
-DB_FILE = 'library_fixed_v11.db'
\ No newline at end of file
+DB_FILE = 'library_fixed_v11.db'
+
+# --- PIPELINE TUNING ---
+BATCH_SIZE = 5000       # Starting rows per SQLite commit; BatchWriter adapts it
+BATCH_MIN_ROWS = 500
+BATCH_MAX_ROWS = 200000
+BATCH_MAX_BYTES = 64 * 1024 * 1024  # Flush early once buffered rows reach this size
+COMMIT_TARGET_SECONDS = 0.5         # Desired duration of one executemany + commit
+READ_CHUNK = 500        # Lines handed to a parser worker at a time
+QUEUE_DEPTH = 32        # Parsed chunks allowed in flight between reader and writer
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 2)  # >1 parses in separate processes
+
+# --- EXPORT ---
+EXPORT_DIR = 'parquet_export'
+EXPORT_BATCH_ROWS = 50000  # Rows per Arrow record batch / Parquet row group
+ANALYTICS_CHUNK_ROWS = 250000  # Rows per pandas chunk in analytics.py
+REPORT_FILE = 'Others/library_data_report.txt'
+
+# --- DEDUPLICATION ---
+DEDUP_THRESHOLD = 0.7    # Minimum Jaccard similarity for a duplicate pair
+DEDUP_MAX_BLOCK = 5000   # Blocks larger than this are too generic to compare
+DEDUP_WORKERS = os.cpu_count() or 1
+
+# --- PUBLICATION PARSING ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TYPO_FIXES_FILE = os.path.join(BASE_DIR, 'typo_fixes.tsv')
+RULE_CONFIDENCE = 0.75  # Publication strings split by rules at this confidence skip NER
+GAZETTEER_SEED_FILE = os.path.join(BASE_DIR, 'gazetteer_seed.tsv')
+GAZETTEER_FILE = 'gazetteer.tsv'  # Seed + names learned from the DB (python gazetteer.py)
+GAZETTEER_MIN_COUNT = 5           # A migrated value must occur this often to be learned
+
+# --- LOOKUPS ---
+LOOKUP_BATCH = 50000  # Keys joined per temp-table batch in lookup.py
+
+# --- STORAGE ---
+NORMALIZED_SCHEMA = False  # New DBs store low-cardinality text as lookup-table ids (flat views on top)
+COMPACT_STORAGE = False    # New DBs store dates as YYYYMMDD ints and prices as minor units (views on top)
+
+# --- WATCH MODE ---
+WATCH_POLL_SECONDS = 1.0    # Idle wait between checks for new lines
+WATCH_COMMIT_SECONDS = 2.0  # Longest a new record waits before it is committed
+WATCH_MAX_BATCH = 5000      # Lines per micro-batch at most
+
+# --- PARSE CACHE ---
+PARSE_CACHE_DIR = 'parse_cache'  # python main.py --cache / python parse_cache.py
+PARSER_VERSION = 1               # Bump to retire every parse cache (parser code is hashed anyway)
+CACHE_FRAME_ROWS = 5000          # Parsed rows pickled per cache frame
+
+# --- RE-PARSE ---
+REPARSE_BATCH = 10000  # Rows read per page and UPDATEd per transaction by reparse.py
+
+# --- SHARDING ---
+SHARD_DIR = 'shards'  # python shard.py run / merge
+
+# --- BLUE/GREEN BUILD ---
+BUILD_PAGE_SIZE = 8192  # Page size of a published database (set by VACUUM INTO)
+BUILD_MIN_RATIO = 0.9   # Refuse to publish a build with fewer biblios than this share of the live DB
@@ -1,49 +1,330 @@
 import sqlite3
-from config import DB_FILE
+import time
+from config import (DB_FILE, BATCH_SIZE, BATCH_MIN_ROWS, BATCH_MAX_ROWS,
+                    BATCH_MAX_BYTES, COMMIT_TARGET_SECONDS, NORMALIZED_SCHEMA,
+                    COMPACT_STORAGE)
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
+# --- SCHEMA ---
+# Logical columns of the two tables, in their flat (original) order
+BIBLIO_COLUMNS = [
+    ("biblio_id", "INTEGER PRIMARY KEY"),
+    ("title", "TEXT"), ("author", "TEXT"), ("edition", "TEXT"), ("isbn", "TEXT"),
+    ("pub_place", "TEXT"), ("pub_publisher", "TEXT"), ("pub_year", "INTEGER"),
+    ("page_count", "INTEGER"), ("language", "TEXT"), ("item_type", "TEXT"),
+    ("raw_json_dump", "TEXT"),  # HERE IS YOUR REFERENCE COLUMN
+    ("isbn13", "TEXT"),         # isbn.normalize_isbn13(isbn): match key for vendor lists
+]
+ITEM_COLUMNS = [
+    ("item_id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("biblio_id", "INTEGER NOT NULL"),
+    ("barcode", "TEXT"), ("call_number", "TEXT"), ("shelving_location", "TEXT"),
+    ("library_code", "TEXT"), ("vendor", "TEXT"), ("bill_number", "TEXT"),
+    ("price", "REAL"), ("currency", "TEXT"),
+    ("bill_date", "DATE"), ("date_acquired", "DATE"), ("last_seen_date", "DATE"),
+    ("is_withdrawn", "INTEGER"), ("is_lost", "INTEGER"), ("is_damaged", "INTEGER"), ("is_restricted", "INTEGER"),
+    ("call_number_key", "TEXT"),  # callnumber.call_number_key(): sorts in shelf order
+]
+# Normalized mode: these repeat across rows and are stored as ids into lookup_<column>
+LOOKUP_COLUMNS = ("item_type", "language", "currency", "library_code", "shelving_location", "vendor")
+# Compact mode: dates are stored as YYYYMMDD integers and price as integer minor units (price_minor)
+DATE_COLUMNS = ("bill_date", "date_acquired", "last_seen_date")
+
+# Logical table -> (primary key, columns, data table when stored behind a view)
+TABLES = {
+    'biblio_master': ("biblio_id", BIBLIO_COLUMNS, "biblio_master_data"),
+    'physical_items': ("item_id", ITEM_COLUMNS, "physical_items_data"),
+}
+# (name, table, columns); columns are logical names
+INDEXES = [
+    # Shelf reading / inventory walks: one range scan, already in shelf order.
+    # shelving_location trails the key so a library-wide walk needs no sort.
+    ("idx_items_call_key", "physical_items", ["call_number_key"]),
+    ("idx_items_shelf", "physical_items", ["library_code", "call_number_key", "shelving_location"]),
+    # Barcode scans (inventory.py) and batch lookups (lookup.py) join on these
+    ("idx_items_barcode", "physical_items", ["barcode"]),
+    ("idx_biblio_isbn13", "biblio_master", ["isbn13"]),
+    # Items of one biblio (joins, summary.py's holdings-by-type upkeep)
+    ("idx_items_biblio", "physical_items", ["biblio_id"]),
+    # Acquisition date ranges (YYYYMMDD integers in compact mode)
+    ("idx_items_acquired", "physical_items", ["date_acquired"]),
+]
+
+
+def _ensure_column(c, table, column, decl):
+    """Adds a column to a table created by an older version of init_db."""
+    if column not in {row[1] for row in c.execute(f"PRAGMA table_info({table})")}:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+MODES = ('normalized', 'compact')
+
+def schema_mode(conn):
+    """{'normalized': bool, 'compact': bool} as recorded when the database was created."""
+    try:
+        stored = dict(conn.execute("SELECT key, value FROM schema_info"))
+    except sqlite3.OperationalError:
+        stored = {}
+    return {m: stored.get(m) == '1' for m in MODES}
+
+def has_views(mode):
+    return mode['normalized'] or mode['compact']
+
+def store_column(name, mode):
+    if mode['normalized'] and name in LOOKUP_COLUMNS: return f"{name}_id"
+    if mode['compact'] and name == "price": return "price_minor"
+    return name
+
+def store_decl(name, decl, mode):
+    if mode['normalized'] and name in LOOKUP_COLUMNS: return f"INTEGER REFERENCES lookup_{name}(id)"
+    if mode['compact'] and (name == "price" or name in DATE_COLUMNS): return "INTEGER"
+    return decl
+
+def view_expr(name, mode, row="t"):
+    """
+    Flat value of a logical column from data-table row `row`: the view's row
+    alias `t`, or a trigger's NEW / OLD (which can't use the view's joins).
+    """
+    if mode['normalized'] and name in LOOKUP_COLUMNS:
+        if row == "t": return f"lookup_{name}.value"
+        return f"(SELECT value FROM lookup_{name} WHERE id = {row}.{name}_id)"
+    if mode['compact'] and name == "price": return f"{row}.price_minor / 100.0"
+    if mode['compact'] and name in DATE_COLUMNS:
+        return (f"CASE WHEN {row}.{name} IS NULL THEN NULL ELSE "
+                f"printf('%04d-%02d-%02d', {row}.{name} / 10000, {row}.{name} / 100 % 100, {row}.{name} % 100) END")
+    return f"{row}.{name}"
+
+def store_expr(name, mode, row="NEW"):
+    """Stored value for logical column `name` from flat row `row` (a trigger's NEW by default)."""
+    if mode['normalized'] and name in LOOKUP_COLUMNS:
+        return f"(SELECT id FROM lookup_{name} WHERE value = {row}.{name})"
+    if mode['compact'] and name == "price": return f"CAST(round({row}.{name} * 100) AS INTEGER)"
+    if mode['compact'] and name in DATE_COLUMNS:
+        return f"CAST(replace(substr({row}.{name}, 1, 10), '-', '') AS INTEGER)"
+    return f"{row}.{name}"
+
+def physical_table(table, mode):
+    return TABLES[table][2] if has_views(mode) else table
+
+def _create_tables(c, mode):
+    for table, (_, columns, _) in TABLES.items():
+        target = physical_table(table, mode)
+        cols = [f"{store_column(n, mode)} {store_decl(n, decl, mode)}" for n, decl in columns]
+        if table == 'physical_items':
+            cols.append(f"FOREIGN KEY(biblio_id) REFERENCES {physical_table('biblio_master', mode)}(biblio_id)")
+        c.execute(f"CREATE TABLE IF NOT EXISTS {target} (\n    " + ",\n    ".join(cols) + "\n)")
+    if not has_views(mode):
+        _ensure_column(c, "biblio_master", "isbn13", "TEXT")
+        _ensure_column(c, "physical_items", "call_number_key", "TEXT")
+
+def _create_views(c, mode):
+    """
+    Views named after the original tables present the flat columns (text for
+    lookup ids, ISO dates, decimal prices) in the original order, and INSTEAD
+    OF triggers route writes through them, so readers and ad-hoc UPDATEs see
+    the flat schema whatever the storage layout.
+    """
+    if mode['normalized']:
+        for column in LOOKUP_COLUMNS:
+            c.execute(f"CREATE TABLE IF NOT EXISTS lookup_{column} (id INTEGER PRIMARY KEY, value TEXT UNIQUE NOT NULL)")
+    for table, (key, columns, data) in TABLES.items():
+        names = [n for n, _ in columns]
+        lookups = [n for n in names if mode['normalized'] and n in LOOKUP_COLUMNS]
+        select = ", ".join(f"{view_expr(n, mode)} AS {n}" for n in names)
+        joins = " ".join(f"LEFT JOIN lookup_{n} ON lookup_{n}.id = t.{n}_id" for n in lookups)
+        c.execute(f"CREATE VIEW IF NOT EXISTS {table} AS SELECT {select} FROM {data} t {joins}")
+
+        intern = "".join(f"INSERT OR IGNORE INTO lookup_{n}(value) SELECT NEW.{n} WHERE NEW.{n} IS NOT NULL; "
+                         for n in lookups)
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_insert INSTEAD OF INSERT ON {table} BEGIN {intern}
+                      INSERT INTO {data} ({", ".join(store_column(n, mode) for n in names)})
+                      VALUES ({", ".join(store_expr(n, mode) for n in names)}); END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_update INSTEAD OF UPDATE ON {table} BEGIN {intern}
+                      UPDATE {data} SET {", ".join(f"{store_column(n, mode)} = {store_expr(n, mode)}" for n in names)}
+                      WHERE {key} = OLD.{key}; END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_delete INSTEAD OF DELETE ON {table} BEGIN
+                      DELETE FROM {data} WHERE {key} = OLD.{key}; END""")
+
+def init_db(db_file=DB_FILE, normalized=None, compact=None):
+    """
+    Opens (creating if needed) the migration database. `normalized` and
+    `compact` pick the storage layout of a new database (defaults:
+    NORMALIZED_SCHEMA, COMPACT_STORAGE); an existing one keeps the layout
+    it was created with.
+    """
+    conn = sqlite3.connect(db_file)
     c = conn.cursor()
     c.execute("PRAGMA foreign_keys = ON;")
-    
-    # 1. BIBLIO MASTER
-    # Added 'raw_json_dump' at the end
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS biblio_master (
-            biblio_id INTEGER PRIMARY KEY,
-            title TEXT, 
-            author TEXT, 
-            edition TEXT, 
-            isbn TEXT,
-            pub_place TEXT, 
-            pub_publisher TEXT, 
-            pub_year INTEGER,
-            page_count INTEGER, 
-            language TEXT, 
-            item_type TEXT,
-            raw_json_dump TEXT  -- HERE IS YOUR REFERENCE COLUMN
-        );
-    """)
-
-    # 2. PHYSICAL ITEMS
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS physical_items (
-            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            biblio_id INTEGER NOT NULL,
-            barcode TEXT,
-            call_number TEXT,
-            shelving_location TEXT,
-            library_code TEXT,
-            vendor TEXT,
-            bill_number TEXT,
-            price REAL,
-            currency TEXT,
-            bill_date DATE,
-            date_acquired DATE,
-            last_seen_date DATE,
-            is_withdrawn INTEGER, is_lost INTEGER, is_damaged INTEGER, is_restricted INTEGER,
-            FOREIGN KEY(biblio_id) REFERENCES biblio_master(biblio_id)
-        );
-    """)
+    # INSERT OR REPLACE must fire DELETE triggers too, or summary.py tables drift
+    c.execute("PRAGMA recursive_triggers = ON;")
+
+    existing = c.execute("SELECT name FROM sqlite_master WHERE name IN ('biblio_master', 'schema_info')").fetchone()
+    if existing:
+        mode = schema_mode(conn)  # Pre-schema_info databases are flat
+    else:
+        mode = {'normalized': NORMALIZED_SCHEMA if normalized is None else normalized,
+                'compact': COMPACT_STORAGE if compact is None else compact}
+    c.execute("CREATE TABLE IF NOT EXISTS schema_info (key TEXT PRIMARY KEY, value TEXT)")
+    c.executemany("INSERT OR IGNORE INTO schema_info VALUES (?, ?)",
+                  [(m, '1' if mode[m] else '0') for m in MODES])
+
+    _create_tables(c, mode)
+    if has_views(mode):
+        _create_views(c, mode)
+    for name, table, columns in INDEXES:
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {physical_table(table, mode)}"
+                  f"({', '.join(store_column(col, mode) for col in columns)})")
     conn.commit()
-    return conn
\ No newline at end of file
+    return conn
+
+def load_ingest_state(conn, path):
+    """(offset, inode) up to which `path` has been ingested, for watch.py to resume from."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS ingest_state (
+                        path TEXT PRIMARY KEY, offset INTEGER, inode INTEGER, updated_at REAL)""")
+    row = conn.execute("SELECT offset, inode FROM ingest_state WHERE path = ?", (path,)).fetchone()
+    return row if row else (0, None)
+
+def save_ingest_state(conn, path, offset, inode):
+    """Records progress; commits with the caller's transaction."""
+    load_ingest_state(conn, path)
+    conn.execute("INSERT OR REPLACE INTO ingest_state VALUES (?, ?, ?, ?)", (path, offset, inode, time.time()))
+
+BIBLIO_INSERT_COLUMNS = [name for name, _ in BIBLIO_COLUMNS]
+ITEM_INSERT_COLUMNS = [name for name, _ in ITEM_COLUMNS if name != "item_id"]
+FLAT = dict.fromkeys(MODES, False)
+
+def insert_sql(table, columns, mode=FLAT, verb="INSERT"):
+    target = physical_table(table, mode)
+    names = ", ".join(store_column(col, mode) for col in columns)
+    return f"{verb} INTO {target} ({names}) VALUES ({','.join('?' * len(columns))})"
+
+BIBLIO_INSERT = insert_sql('biblio_master', BIBLIO_INSERT_COLUMNS, verb="INSERT OR REPLACE")
+ITEM_INSERT = insert_sql('physical_items', ITEM_INSERT_COLUMNS)
+
+
+def date_number(value):
+    """date / datetime / 'YYYY-MM-DD...' -> YYYYMMDD int (compact storage), None if unparseable."""
+    if value is None: return None
+    if hasattr(value, 'year'):
+        return value.year * 10000 + value.month * 100 + value.day
+    digits = str(value)[:10].replace('-', '')
+    return int(digits) if len(digits) == 8 and digits.isdigit() else None
+
+def minor_units(price):
+    """Price in minor units (paise, cents); every currency we see has two decimals."""
+    return None if price is None else int(round(price * 100))
+
+class Interner:
+    """
+    value -> id cache over the lookup tables, so the writer resolves each
+    distinct value once per run rather than once per row.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {col: dict(conn.execute(f"SELECT value, id FROM lookup_{col}")) for col in LOOKUP_COLUMNS}
+
+    def id(self, column, value):
+        if value is None: return None
+        ids = self.ids[column]
+        i = ids.get(value)
+        if i is None:
+            self.conn.execute(f"INSERT OR IGNORE INTO lookup_{column}(value) VALUES (?)", (value,))
+            i = ids[value] = self.conn.execute(
+                f"SELECT id FROM lookup_{column} WHERE value = ?", (value,)).fetchone()[0]
+        return i
+
+def row_encoder(columns, mode, interner=None):
+    """Returns f(row) converting a parsed row to the stored form for `mode`, or None if it's as-is."""
+    converters = []
+    for i, col in enumerate(columns):
+        if mode['normalized'] and col in LOOKUP_COLUMNS:
+            converters.append((i, lambda v, col=col: interner.id(col, v)))
+        elif mode['compact'] and col == "price":
+            converters.append((i, minor_units))
+        elif mode['compact'] and col in DATE_COLUMNS:
+            converters.append((i, date_number))
+    if not converters: return None
+    def encode(row):
+        row = list(row)
+        for i, convert in converters:
+            row[i] = convert(row[i])
+        return row
+    return encode
+
+def row_bytes(row):
+    """Rough in-memory size of a row: text payload plus a word per column."""
+    return sum(len(v) for v in row if isinstance(v, str)) + 8 * len(row)
+
+class BatchWriter:
+    """
+    Buffers parsed (biblio_row, item_row) pairs and commits them in batches.
+    Owns its connection, so it must be created on the thread that writes.
+
+    Batch size adapts to the disk: every commit is timed and the row target
+    is steered towards COMMIT_TARGET_SECONDS per transaction (at most doubling
+    or halving per step). Independently, a batch is flushed once its buffered
+    rows reach BATCH_MAX_BYTES, since raw_json_dump sizes vary a lot.
+
+    Rows are converted to the database's storage layout on the way in
+    (lookup ids, integer dates / minor units) and written to its data tables.
+    """
+    def __init__(self, conn, batch_size=BATCH_SIZE, target_seconds=COMMIT_TARGET_SECONDS,
+                 max_bytes=BATCH_MAX_BYTES):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.batch_biblio = []
+        self.batch_items = []
+        self.batch_bytes = 0
+        self.commits = 0
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        mode = schema_mode(conn)
+        interner = Interner(conn) if mode['normalized'] else None
+        self.encode_biblio = row_encoder(BIBLIO_INSERT_COLUMNS, mode, interner)
+        self.encode_item = row_encoder(ITEM_INSERT_COLUMNS, mode, interner)
+        self.biblio_insert = insert_sql('biblio_master', BIBLIO_INSERT_COLUMNS, mode, "INSERT OR REPLACE")
+        self.item_insert = insert_sql('physical_items', ITEM_INSERT_COLUMNS, mode)
+
+    def add(self, biblio_row, item_row=None):
+        self.batch_biblio.append(biblio_row)
+        self.batch_bytes += row_bytes(biblio_row)
+        if item_row is not None:
+            self.batch_items.append(item_row)
+            self.batch_bytes += row_bytes(item_row)
+        if len(self.batch_biblio) >= self.batch_size or self.batch_bytes >= self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.batch_biblio: return
+        rows = len(self.batch_biblio)
+        t0 = time.perf_counter()
+        c = self.conn.cursor()
+        biblio, items = self.batch_biblio, self.batch_items
+        if self.encode_biblio: biblio = map(self.encode_biblio, biblio)
+        if self.encode_item: items = map(self.encode_item, items)
+        c.executemany(self.biblio_insert, biblio)
+        c.executemany(self.item_insert, items)
+        self.conn.commit()
+        elapsed = time.perf_counter() - t0
+        self.batch_biblio = []; self.batch_items = []; self.batch_bytes = 0
+        self.commits += 1
+        self.rows_written += rows
+        self.write_seconds += elapsed
+        self.adapt(rows, elapsed)
+
+    def adapt(self, rows, elapsed):
+        # Only full batches say anything about throughput; byte-capped and
+        # final partial flushes would drag the target down for no reason.
+        if rows < self.batch_size or elapsed <= 0: return
+        ideal = rows * self.target_seconds / elapsed
+        ideal = min(max(ideal, self.batch_size / 2), self.batch_size * 2)
+        self.batch_size = int(min(max(ideal, BATCH_MIN_ROWS), BATCH_MAX_ROWS))
+
+    def report(self):
+        avg = self.rows_written / self.commits if self.commits else 0
+        return (f"{self.commits} commits, avg {avg:.0f} rows/commit, "
+                f"final target {self.batch_size} rows, {self.write_seconds:.2f}s in SQLite")
+
+    def close(self):
+        self.flush()
+        self.conn.close()
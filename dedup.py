@@ -0,0 +1,152 @@
+import argparse
+import re
+import sqlite3
+import zlib
+from collections import defaultdict
+from multiprocessing import Pool
+from config import DB_FILE, DEDUP_THRESHOLD, DEDUP_MAX_BLOCK, DEDUP_WORKERS
+
+STOPWORDS = {"A", "AN", "THE", "OF", "AND", "TO", "IN", "ON", "FOR", "WITH", "BY"}
+WORD = re.compile(r'[A-Z0-9]+')
+
+# MinHash: NUM_PERM universal hashes, banded for LSH (BANDS * ROWS == NUM_PERM)
+NUM_PERM, BANDS, ROWS = 32, 8, 4
+PRIME = (1 << 61) - 1
+PERMS = [((i * 0x9E3779B1 + 1) % PRIME, (i * 0x85EBCA6B + 7) % PRIME) for i in range(1, NUM_PERM + 1)]
+MINHASH_ABOVE = 40  # Blocks smaller than this are compared all-pairs
+
+
+def tokens(text):
+    return [t for t in WORD.findall((text or "").upper()) if t not in STOPWORDS]
+
+def trigrams(text):
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def record_shingles(title, author, publisher):
+    """Character trigrams over the normalized title, plus the author/publisher words."""
+    shingles = trigrams(" ".join(tokens(title)))
+    shingles.update("A:" + t for t in tokens(author))
+    shingles.update("P:" + t for t in tokens(publisher))
+    return shingles
+
+def blocking_keys(title, year, isbn13):
+    """
+    Cheap keys that true duplicates almost always share. A pair is only
+    compared if the two records meet in at least one block.
+    """
+    keys = []
+    if isbn13: keys.append("I:" + isbn13)
+    words = tokens(title)
+    if words:
+        keys.append(f"T:{' '.join(words[:2])}|{year or ''}")
+    return keys
+
+def title_numbers(title):
+    # "Vol. 1" and "Vol. 2" share nearly every trigram but are different books
+    return frozenset(t for t in tokens(title) if t.isdigit())
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def minhash(shingles):
+    hashed = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    return [min((a * h + b) % PRIME for h in hashed) for a, b in PERMS]
+
+def compare_block(block):
+    """Returns (id_a, id_b, score) for every pair in the block above the threshold."""
+    key, members = block  # members: [(biblio_id, shingles, title_numbers), ...]
+    pairs = []
+    if len(members) < MINHASH_ABOVE:
+        candidates = ((i, j) for i in range(len(members)) for j in range(i + 1, len(members)))
+    else:
+        # LSH: only pairs that collide in some band are scored exactly
+        buckets = defaultdict(list)
+        for i, (_, shingles, _) in enumerate(members):
+            sig = minhash(shingles)
+            for band in range(BANDS):
+                buckets[(band, tuple(sig[band * ROWS:(band + 1) * ROWS]))].append(i)
+        candidates = {(i, j) for bucket in buckets.values() if len(bucket) > 1
+                      for x, i in enumerate(bucket) for j in bucket[x + 1:]}
+    for i, j in candidates:
+        if members[i][2] != members[j][2]: continue
+        score = jaccard(members[i][1], members[j][1])
+        if score >= DEDUP_THRESHOLD:
+            pairs.append((members[i][0], members[j][0], score))
+    return pairs
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = self.parent.setdefault(x, x)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while x != root:  # Path compression
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Smallest biblio_id becomes the cluster id
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def load_blocks(conn, max_block=DEDUP_MAX_BLOCK):
+    blocks = defaultdict(list)
+    cursor = conn.execute("SELECT biblio_id, title, author, pub_publisher, pub_year, isbn13 FROM biblio_master")
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows: break
+        for b_id, title, author, publisher, year, isbn13 in rows:
+            keys = blocking_keys(title, year, isbn13)
+            if not keys: continue
+            member = (b_id, record_shingles(title, author, publisher), title_numbers(title))
+            for key in keys:
+                blocks[key].append(member)
+    # Singletons can't hold duplicates; giant blocks are generic titles
+    # ("Annual report|") that would go quadratic, so they are skipped.
+    oversized = sum(1 for m in blocks.values() if len(m) > max_block)
+    usable = [(k, m) for k, m in blocks.items() if 1 < len(m) <= max_block]
+    return usable, oversized
+
+def find_duplicates(db_file=DB_FILE, workers=DEDUP_WORKERS):
+    conn = sqlite3.connect(db_file)
+    print("Building blocks...")
+    blocks, oversized = load_blocks(conn)
+    print(f"{len(blocks)} candidate blocks ({oversized} oversized blocks skipped)")
+
+    clusters = UnionFind()
+    best = {}
+    with Pool(workers) as pool:
+        for pairs in pool.imap_unordered(compare_block, blocks, chunksize=64):
+            for a, b, score in pairs:
+                clusters.union(a, b)
+                best[a] = max(best.get(a, 0.0), score)
+                best[b] = max(best.get(b, 0.0), score)
+
+    rows = sorted((clusters.find(b_id), b_id, score) for b_id, score in best.items())
+    c = conn.cursor()
+    c.executescript("""
+        DROP TABLE IF EXISTS dup_candidates;
+        CREATE TABLE dup_candidates (
+            cluster_id INTEGER,   -- smallest biblio_id in the cluster
+            biblio_id INTEGER,
+            similarity REAL,      -- best Jaccard score against another member
+            PRIMARY KEY (cluster_id, biblio_id)
+        );
+    """)
+    c.executemany("INSERT INTO dup_candidates VALUES (?,?,?)", rows)
+    conn.commit()
+    conn.close()
+    print(f"{len({r[0] for r in rows})} clusters covering {len(rows)} biblios written to dup_candidates")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Find candidate duplicate records in biblio_master.")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--workers', type=int, default=DEDUP_WORKERS)
+    args = ap.parse_args()
+    find_duplicates(args.db, args.workers)
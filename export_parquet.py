@@ -0,0 +1,95 @@
+import argparse
+import sqlite3
+import sys
+from config import DB_FILE, EXPORT_DIR, EXPORT_BATCH_ROWS
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    print("Error: pyarrow is required for Parquet export.")
+    print("Please run: pip install pyarrow")
+    sys.exit(1)
+
+# Low-cardinality text columns are stored dictionary-encoded
+DICT = pa.dictionary(pa.int32(), pa.string())
+
+COLUMN_TYPES = {
+    'biblio_id': pa.int64(), 'item_id': pa.int64(),
+    'pub_year': pa.int32(), 'page_count': pa.int32(), 'pub_decade': pa.int32(),
+    'price': pa.float64(),
+    'bill_date': pa.date32(), 'date_acquired': pa.date32(), 'last_seen_date': pa.date32(),
+    'is_withdrawn': pa.int8(), 'is_lost': pa.int8(), 'is_damaged': pa.int8(), 'is_restricted': pa.int8(),
+    'item_type': DICT, 'language': DICT, 'currency': DICT, 'library_code': DICT,
+    'shelving_location': DICT, 'vendor': DICT,
+}
+
+PARTITION = pa.schema([('item_type', pa.string()), ('pub_decade', pa.int32())])
+
+EXPORTS = {
+    'biblio_master': """
+        SELECT biblio_id, title, author, edition, isbn, pub_place, pub_publisher, pub_year,
+               page_count, language, item_type, (pub_year / 10) * 10 AS pub_decade{raw}
+        FROM biblio_master""",
+    # Items carry their biblio's item_type/decade so both tables partition alike
+    'physical_items': """
+        SELECT p.item_id, p.biblio_id, p.barcode, p.call_number, p.shelving_location,
+               p.library_code, p.vendor, p.bill_number, p.price, p.currency,
+               p.bill_date, p.date_acquired, p.last_seen_date,
+               p.is_withdrawn, p.is_lost, p.is_damaged, p.is_restricted,
+               b.item_type, (b.pub_year / 10) * 10 AS pub_decade
+        FROM physical_items p LEFT JOIN biblio_master b ON b.biblio_id = p.biblio_id""",
+}
+
+def column_type(name):
+    # Partition keys are written into the path, not the files, as plain values
+    if name in PARTITION.names: return PARTITION.field(name).type
+    return COLUMN_TYPES.get(name, pa.string())
+
+def to_array(values, typ):
+    if pa.types.is_date32(typ):
+        # SQLite hands dates back as ISO text
+        return pa.array(values, type=pa.string()).cast(typ)
+    if pa.types.is_dictionary(typ):
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    return pa.array(values, type=typ)
+
+def record_batches(cursor, schema, batch_rows):
+    """Turns a cursor into Arrow record batches, holding one batch in memory at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows: break
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [to_array(col, field.type) for col, field in zip(columns, schema)], schema=schema)
+
+def export_table(conn, table, out_dir, batch_rows=EXPORT_BATCH_ROWS, with_raw=False):
+    sql = EXPORTS[table].format(raw=", raw_json_dump" if with_raw else "")
+    cursor = conn.execute(sql)
+    names = [d[0] for d in cursor.description]
+    schema = pa.schema([(name, column_type(name)) for name in names])
+    ds.write_dataset(
+        record_batches(cursor, schema, batch_rows), f"{out_dir}/{table}",
+        schema=schema, format='parquet',
+        partitioning=ds.partitioning(PARTITION, flavor='hive'),
+        existing_data_behavior='delete_matching',
+        max_rows_per_group=batch_rows,
+    )
+
+def run_export(db_file=DB_FILE, out_dir=EXPORT_DIR, batch_rows=EXPORT_BATCH_ROWS, with_raw=False):
+    # write_dataset pulls batches from its own thread; the cursor is only ever used by one
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    for table in EXPORTS:
+        print(f"Exporting {table} -> {out_dir}/{table}/ ...")
+        export_table(conn, table, out_dir, batch_rows, with_raw)
+    conn.close()
+    print("Export Complete.")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export biblio_master and physical_items to partitioned Parquet.")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--out', default=EXPORT_DIR)
+    ap.add_argument('--batch-rows', type=int, default=EXPORT_BATCH_ROWS)
+    ap.add_argument('--with-raw', action='store_true', help="Include raw_json_dump in biblio_master")
+    args = ap.parse_args()
+    run_export(args.db, args.out, args.batch_rows, args.with_raw)
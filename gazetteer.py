@@ -0,0 +1,162 @@
+import argparse
+import os
+import re
+import sqlite3
+from config import DB_FILE, GAZETTEER_SEED_FILE, GAZETTEER_FILE, GAZETTEER_MIN_COUNT
+
+PLACE_KINDS = {"CITY", "STATE", "PLACE"}
+TOKEN = re.compile(r"[A-Za-z0-9&']+")
+PUNCT_ONLY = re.compile(r"^[\s,.:;()\-]*$")
+# A word right next to a match, with only spaces in between
+WORD_AFTER = re.compile(r"^\s*[A-Za-z0-9&']")
+WORD_BEFORE = re.compile(r"[A-Za-z0-9&']\s*$")
+
+
+def name_key(text):
+    return tuple(t.upper() for t in TOKEN.findall(text))
+
+def load_entries(path):
+    """Reads KIND<TAB>NAME lines; '#' starts a comment."""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'): continue
+            kind, name = line.split('\t', 1)
+            entries.append((kind.strip().upper(), name.strip()))
+    return entries
+
+
+class Gazetteer:
+    """
+    Token trie over known places and publishers. find() walks the text's
+    tokens once and returns the longest entry starting at each position,
+    so lookup cost depends on the text, not on how many names we know.
+    """
+    def __init__(self, entries=()):
+        self.trie = {}
+        self.size = 0
+        for kind, name in entries:
+            self.add(kind, name)
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads GAZETTEER_FILE if it has been built, otherwise the seed list."""
+        if path is None:
+            path = GAZETTEER_FILE if os.path.exists(GAZETTEER_FILE) else GAZETTEER_SEED_FILE
+        return cls(load_entries(path))
+
+    def add(self, kind, name):
+        key = name_key(name)
+        if not key: return
+        node = self.trie
+        for token in key:
+            node = node.setdefault(token, {})
+        if None not in node:
+            self.size += 1
+        node.setdefault(None, kind)  # First kind wins (seed entries load first)
+
+    def find(self, text):
+        """Returns [(kind, start, end)] character spans of non-overlapping longest matches."""
+        tokens = [(m.group(0).upper(), m.start(), m.end()) for m in TOKEN.finditer(text)]
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node, best = self.trie, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j][0])
+                if node is None: break
+                if None in node: best = (node[None], j)
+            if best:
+                kind, j = best
+                matches.append((kind, tokens[i][1], tokens[j][2]))
+                i = j + 1
+            else:
+                i += 1
+        return matches
+
+    def split(self, text):
+        """
+        Deterministic place/publisher split from known names.
+        Returns (place, publisher), or None when the gazetteer can't decide
+        and the string should go on to the NER model.
+        """
+        matches = self.find(text)
+        if not matches: return None
+        places = [(s, e) for kind, s, e in matches if kind in PLACE_KINDS]
+
+        if not places:
+            # Known publisher: only safe if nothing unknown (maybe a place) is left
+            leftover = self._remove(text, [(s, e) for _, s, e in matches])
+            return None if leftover else (None, text.strip(" ,.:;-"))
+
+        # A place running into unknown words is part of a name ("Delhi University
+        # Press", "Kerala Sahitya Akademi"), not a place of its own: leave it to NER
+        spans = sorted((s, e) for _, s, e in matches)
+        bounds = [0] + [pos for span in spans for pos in span] + [len(text)]
+        for i, span in enumerate(spans):
+            if span in places and (WORD_BEFORE.search(text[bounds[2 * i]:span[0]])
+                                   or WORD_AFTER.match(text[span[1]:bounds[2 * i + 3]])):
+                return None
+
+        # With the place(s) known, everything else is the publisher
+        publisher = self._remove(text, places)
+        return ", ".join(text[s:e] for s, e in places), publisher or None
+
+    @staticmethod
+    def _remove(text, spans):
+        parts, pos = [], 0
+        for s, e in spans:
+            parts.append(text[pos:s]); pos = e
+        parts.append(text[pos:])
+        return " ".join(p.strip(" ,.:;-") for p in parts if not PUNCT_ONLY.match(p)) or None
+
+
+def learned_entries(conn, known, min_count=GAZETTEER_MIN_COUNT):
+    """Frequent pub_place / pub_publisher values already in the database."""
+    entries = []
+    for (value,) in conn.execute(
+            "SELECT pub_place FROM biblio_master WHERE pub_place IS NOT NULL "
+            "GROUP BY pub_place HAVING COUNT(*) >= ?", (min_count,)):
+        for place in value.split(','):  # NER joins multiple places with ", "
+            place = place.strip(" .")
+            if place and len(place.split()) <= 3 and not any(c.isdigit() for c in place):
+                entries.append(("PLACE", place))
+    for (value,) in conn.execute(
+            "SELECT pub_publisher FROM biblio_master WHERE pub_publisher IS NOT NULL "
+            "GROUP BY pub_publisher HAVING COUNT(*) >= ?", (min_count,)):
+        value = value.strip(" ,.")
+        if not value or ':' in value or any(c.isdigit() for c in value) or len(value.split()) > 6:
+            continue
+        # Leftover-as-publisher fallbacks often still hold a place ("NEW DELHI, S. Chand")
+        if any(kind in PLACE_KINDS for kind, _, _ in known.find(value)):
+            continue
+        entries.append(("PUBLISHER", value))
+    return entries
+
+def build_gazetteer(db_file=DB_FILE, out_file=GAZETTEER_FILE, min_count=GAZETTEER_MIN_COUNT):
+    seed = load_entries(GAZETTEER_SEED_FILE)
+    gazetteer = Gazetteer(seed)
+    conn = sqlite3.connect(db_file)
+    seen = {name_key(name) for _, name in seed}
+    learned = []
+    for kind, name in learned_entries(conn, gazetteer, min_count):
+        if name_key(name) not in seen:
+            seen.add(name_key(name))
+            learned.append((kind, name))
+    conn.close()
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write(f"# Built from {GAZETTEER_SEED_FILE} and {db_file} (min count {min_count})\n")
+        for kind, name in seed + learned:
+            f.write(f"{kind}\t{name}\n")
+    for kind, name in learned:
+        gazetteer.add(kind, name)
+    print(f"Gazetteer written to {out_file}: {gazetteer.size} names ({len(learned)} learned)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build the place/publisher gazetteer from the seed list and migrated data.")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--out', default=GAZETTEER_FILE)
+    ap.add_argument('--min-count', type=int, default=GAZETTEER_MIN_COUNT)
+    args = ap.parse_args()
+    build_gazetteer(args.db, args.out, args.min_count)
@@ -0,0 +1,106 @@
+import argparse
+import time
+from datetime import date
+from callnumber import shelf_bounds
+from config import DB_FILE
+from database import init_db
+
+
+def read_scans(path):
+    """Yields one barcode per scan line; CSV/TSV exports keep the barcode in the first column."""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            barcode = line.replace('\t', ',').split(',', 1)[0].strip().strip('"')
+            if barcode and barcode.lower() != 'barcode':
+                yield (barcode,)
+
+def scope_filter(library_code=None, shelving_location=None, call_range=None):
+    """WHERE clause (over physical_items p) for the part of the collection being counted."""
+    where, params = ["COALESCE(p.is_withdrawn, 0) = 0", "p.barcode IS NOT NULL"], []
+    if library_code is not None:
+        where.append("p.library_code = ?"); params.append(library_code)
+    if shelving_location is not None:
+        where.append("p.shelving_location = ?"); params.append(shelving_location)
+    if call_range is not None:
+        where.append("p.call_number_key BETWEEN ? AND ?"); params.extend(shelf_bounds(*call_range))
+    return " AND ".join(where), params
+
+def reconcile(conn, scan_file, scan_date=None, library_code=None, shelving_location=None,
+              call_range=None, mark_lost=False):
+    """
+    Set-based stock-take: the scans are bulk-loaded into a temp table, then one
+    UPDATE stamps last_seen_date on every scanned item and anti-joins find the
+    missing items (in scope, never scanned) and unknown barcodes (scanned, not
+    in physical_items). Everything happens in a single transaction.
+    """
+    scan_date = scan_date or date.today().isoformat()
+    where, params = scope_filter(library_code, shelving_location, call_range)
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS scans (barcode TEXT PRIMARY KEY) WITHOUT ROWID")
+    c.execute("DELETE FROM temp.scans")
+    c.execute("""CREATE TABLE IF NOT EXISTS inventory_missing (
+                     item_id INTEGER PRIMARY KEY, barcode TEXT, call_number TEXT,
+                     library_code TEXT, shelving_location TEXT, scan_date DATE)""")
+    try:
+        c.executemany("INSERT OR IGNORE INTO temp.scans VALUES (?)", read_scans(scan_file))
+        scanned = c.execute("SELECT COUNT(*) FROM temp.scans").fetchone()[0]
+
+        # Counted up front: rowcount is always 0 for an UPDATE through a view (normalized schema)
+        seen = c.execute("SELECT COUNT(*) FROM physical_items "
+                         "WHERE barcode IN (SELECT barcode FROM temp.scans)").fetchone()[0]
+        c.execute("UPDATE physical_items SET last_seen_date = ? "
+                  "WHERE barcode IN (SELECT barcode FROM temp.scans)", (scan_date,))
+
+        unknown = c.execute("""SELECT COUNT(*) FROM temp.scans s
+                               WHERE NOT EXISTS (SELECT 1 FROM physical_items p WHERE p.barcode = s.barcode)
+                            """).fetchone()[0]
+
+        c.execute("DELETE FROM inventory_missing")
+        c.execute(f"""INSERT INTO inventory_missing
+                      SELECT p.item_id, p.barcode, p.call_number, p.library_code, p.shelving_location, ?
+                      FROM physical_items p
+                      WHERE {where}
+                        AND NOT EXISTS (SELECT 1 FROM temp.scans s WHERE s.barcode = p.barcode)""",
+                  [scan_date] + params)
+        missing = c.rowcount
+        if mark_lost:
+            c.execute("UPDATE physical_items SET is_lost = 1 "
+                      "WHERE item_id IN (SELECT item_id FROM inventory_missing)")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return {'scanned': scanned, 'seen': seen, 'missing': missing, 'unknown': unknown}
+
+def write_unknown(conn, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for (barcode,) in conn.execute("""SELECT barcode FROM temp.scans s
+                                          WHERE NOT EXISTS (SELECT 1 FROM physical_items p
+                                                            WHERE p.barcode = s.barcode)"""):
+            f.write(barcode + "\n")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Reconcile a barcode scan file against physical_items.")
+    ap.add_argument('scan_file')
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--date', help="Date stamped into last_seen_date (default: today)")
+    ap.add_argument('--library')
+    ap.add_argument('--location')
+    ap.add_argument('--range', nargs=2, metavar=('LOW', 'HIGH'), help="Only count call numbers LOW..HIGH as expected")
+    ap.add_argument('--mark-lost', action='store_true', help="Also set is_lost on missing items")
+    ap.add_argument('--unknown-out', help="Write scanned barcodes not in the catalogue to this file")
+    args = ap.parse_args()
+
+    conn = init_db(args.db)
+    t0 = time.perf_counter()
+    result = reconcile(conn, args.scan_file, args.date, args.library, args.location,
+                       args.range, args.mark_lost)
+    print(f"Scanned barcodes: {result['scanned']}")
+    print(f"Seen (last_seen_date updated): {result['seen']} items")
+    print(f"Missing (in scope, not scanned): {result['missing']} items -> inventory_missing")
+    print(f"Unknown (scanned, not in catalogue): {result['unknown']}")
+    if args.unknown_out:
+        write_unknown(conn, args.unknown_out)
+        print(f"Unknown barcodes written to {args.unknown_out}")
+    print(f"Reconciled in {time.perf_counter() - t0:.2f}s")
+    conn.close()
@@ -0,0 +1,125 @@
+import argparse
+import csv
+import re
+import sys
+from collections import defaultdict
+from itertools import chain
+from config import DB_FILE, PATTERNS
+from database import init_db
+
+# Digit runs with optional hyphens, ending in a digit or X (ISBN-10 check).
+# Space-grouped ISBNs ("978 0 13 ...") are only tried when nothing else matched,
+# since spaces also separate several ISBNs in one field.
+CANDIDATE = re.compile(r'\d[\d\-]{8,15}[\dXx]')
+SPACED_CANDIDATE = re.compile(r'\d[\d\- ]{8,15}[\dXx]')
+FLOAT_TAIL = re.compile(r'^(\d+)\.0+$')  # "9780131103627.0" from spreadsheet round-trips
+
+
+def isbn13_check(first12):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(first12))
+    return str(-total % 10)
+
+def to_isbn13(candidate):
+    """
+    ISBN-10s get the 978 prefix and a recomputed check digit; ISBN-13s are kept
+    as catalogued. Check digits aren't enforced: a mistyped one in our records
+    should still match the same mistyped value elsewhere in the catalogue.
+    """
+    digits = re.sub(r'[\- ]', '', candidate).upper()
+    if len(digits) == 10 and digits[:9].isdigit():
+        core = "978" + digits[:9]
+        return core + isbn13_check(core)
+    if len(digits) == 13 and digits.isdigit() and digits[:3] in ("978", "979"):
+        return digits
+    return None
+
+def expand_scientific(match):
+    # "9.780131103627E+12" is recoverable; "8.1203123e+09" lost digits and is not
+    digits, exponent = match.group(1).replace('.', ''), int(match.group(2))
+    return digits[:exponent + 1] if len(digits) >= exponent + 1 else ""
+
+def normalize_isbn13(raw):
+    """
+    Canonical ISBN-13 for a messy 020 value, or None. Handles hyphens and spaces,
+    ISBN-10s, qualifiers ("0131103628 (pbk.)"), several ISBNs in one field (the
+    first one wins) and numbers saved in scientific notation. Scientific values
+    whose mantissa is too short to hold every digit are None rather than a guess.
+    """
+    if not raw: return None
+    text = PATTERNS['scientific_notation'].sub(expand_scientific, str(raw).strip())
+    text = FLOAT_TAIL.sub(r'\1', text)
+    for pattern in (CANDIDATE, SPACED_CANDIDATE):
+        for match in pattern.finditer(text):
+            isbn = to_isbn13(match.group(0))
+            if isbn: return isbn
+    return None
+
+
+def load_index(conn):
+    """In-memory hash index isbn13 -> [biblio_id], built in one pass over the column."""
+    index = defaultdict(list)
+    for isbn13, b_id in conn.execute(
+            "SELECT isbn13, biblio_id FROM biblio_master WHERE isbn13 IS NOT NULL ORDER BY isbn13, biblio_id"):
+        index[isbn13].append(b_id)
+    return index
+
+def isbn_column(header):
+    for i, name in enumerate(header):
+        if 'isbn' in name.lower(): return i
+    return None
+
+def match_vendor_list(conn, in_file, out=sys.stdout, column=None):
+    """
+    Streams a vendor CSV and writes it back with status (owned / not-owned /
+    invalid), the normalized ISBN-13 and the matching biblio_ids appended.
+    """
+    index = load_index(conn)
+    counts = defaultdict(int)
+    with open(in_file, newline='', encoding='utf-8-sig', errors='replace') as f:
+        reader = csv.reader(f)
+        writer = csv.writer(out)
+        first = next(reader, None)
+        if first is None: return counts
+        col = column if column is not None else isbn_column(first)
+        if col is None: col = 0  # No 'isbn' header: assume the first column
+        if col < len(first) and normalize_isbn13(first[col]) is None:
+            writer.writerow(first + ['status', 'isbn13', 'biblio_ids'])
+            rows = []
+        else:
+            rows = [first]  # Headerless file
+        for row in chain(rows, reader):
+            isbn = normalize_isbn13(row[col]) if col < len(row) else None
+            ids = index.get(isbn, ()) if isbn else ()
+            status = 'owned' if ids else ('not-owned' if isbn else 'invalid')
+            counts[status] += 1
+            writer.writerow(row + [status, isbn or '', ' '.join(map(str, ids))])
+    return counts
+
+def backfill_isbn13(conn):
+    """Fills isbn13 for rows migrated before the column existed."""
+    conn.create_function("normalize_isbn13", 1, normalize_isbn13, deterministic=True)
+    before = conn.total_changes  # Unlike rowcount, also counts writes made by view triggers
+    conn.execute("UPDATE biblio_master SET isbn13 = normalize_isbn13(isbn) "
+                 "WHERE isbn13 IS NULL AND normalize_isbn13(isbn) IS NOT NULL")
+    conn.commit()
+    return conn.total_changes - before
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Match a vendor ISBN list against the catalogue.")
+    ap.add_argument('vendor_csv', nargs='?')
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--out', help="Output CSV (default: stdout)")
+    ap.add_argument('--column', type=int, help="0-based ISBN column (default: header containing 'isbn', else 0)")
+    ap.add_argument('--backfill', action='store_true', help="Compute isbn13 for existing rows first")
+    args = ap.parse_args()
+
+    conn = init_db(args.db)
+    if args.backfill:
+        print(f"Backfilled {backfill_isbn13(conn)} ISBN-13 keys", file=sys.stderr)
+    if args.vendor_csv:
+        out = open(args.out, 'w', newline='', encoding='utf-8') if args.out else sys.stdout
+        counts = match_vendor_list(conn, args.vendor_csv, out, args.column)
+        if args.out: out.close()
+        print(f"owned: {counts['owned']}, not-owned: {counts['not-owned']}, invalid: {counts['invalid']}",
+              file=sys.stderr)
+    conn.close()
@@ -0,0 +1,245 @@
+import glob
+import gzip
+import json
+import lzma
+import mmap
+import os
+import queue
+import sys
+import threading
+
+# orjson decodes straight from a memoryview, so lines never get copied.
+# The stdlib decoder needs real bytes, so we fall back to slicing copies.
+try:
+    import orjson
+    loads = orjson.loads
+    ZERO_COPY = True
+except ImportError:
+    loads = json.loads
+    ZERO_COPY = False
+
+COUNT_CHUNK = 64 * 1024 * 1024
+DECOMPRESS_BLOCK = 4 * 1024 * 1024  # Decompressed bytes per block handed to the line splitter
+DECOMPRESS_AHEAD = 8                # Blocks the decompression thread may run ahead
+
+
+class MappedJSONL:
+    """
+    Read-only mmap view over a JSONL export.
+    Lines are found with mmap.find() on the mapped buffer and handed out as
+    (offset, line) pairs, where `line` still carries its trailing newline and
+    `offset` is the byte position of its first character. Feeding `offset`
+    back into iter_lines() resumes exactly at that record.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        # mmap refuses zero-length files
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._view = memoryview(self._map) if self._map is not None else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # A caller still holds a line slice; GC will unmap it.
+            self._map = None
+        self._file.close()
+
+    def align(self, offset):
+        """Returns the start of the first line that begins at or after `offset`."""
+        if offset <= 0: return 0
+        if offset >= self.size: return self.size
+        if self._map[offset - 1] == 0x0A: return offset
+        nl = self._map.find(b'\n', offset)
+        return self.size if nl == -1 else nl + 1
+
+    def complete_size(self):
+        """End of the last newline-terminated line; a line still being appended is left out."""
+        if self._map is None: return 0
+        return self._map.rfind(b'\n') + 1
+
+    def iter_lines(self, start=0, end=None):
+        """
+        Yields (offset, line) for every line whose first byte lies in [start, end).
+        `start` is aligned forward to a line boundary, so arbitrary byte ranges
+        partition the file without splitting or duplicating records.
+        """
+        if self._map is None: return
+        end = self.size if end is None else min(end, self.size)
+        pos = self.align(start)
+        mm = self._map
+        view = self._view if ZERO_COPY else mm
+        while pos < end:
+            nl = mm.find(b'\n', pos)
+            stop = self.size if nl == -1 else nl + 1
+            yield pos, view[pos:stop]
+            pos = stop
+
+    def count_lines(self, start=0, end=None):
+        """Counts lines in [start, end) the same way iter_lines() would yield them."""
+        if self._map is None: return 0
+        end = self.size if end is None else min(end, self.size)
+        start = self.align(start)
+        if start >= end: return 0
+        stop = self.align(end)
+        total = 0
+        for chunk_start in range(start, stop, COUNT_CHUNK):
+            total += self._map[chunk_start:min(chunk_start + COUNT_CHUNK, stop)].count(b'\n')
+        # Last line of the file without a trailing newline
+        if stop == self.size and self._map[self.size - 1] != 0x0A:
+            total += 1
+        return total
+
+    def split_ranges(self, parts):
+        """Splits the file into `parts` line-aligned (start, end) byte ranges."""
+        parts = max(1, parts)
+        bounds = [self.align(self.size * i // parts) for i in range(parts)] + [self.size]
+        return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+
+def _open_zstd(path):
+    try:
+        import zstandard
+    except ImportError:
+        print("Error: zstandard is required to read .zst inputs.")
+        print("Please run: pip install zstandard")
+        sys.exit(1)
+    # Multi-frame exports (zstd -T0 / pzstd) are read frame after frame
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+
+OPENERS = {'.gz': gzip.open, '.xz': lzma.open, '.zst': _open_zstd}
+
+
+class StreamedJSONL:
+    """
+    Line reader over a gzip / xz / zstd export, with the same iter_lines() /
+    count_lines() interface as MappedJSONL. Offsets are positions in the
+    decompressed stream. A background thread decompresses DECOMPRESS_BLOCK
+    sized blocks ahead of the consumer (zlib, lzma and zstandard all release
+    the GIL), so inflating overlaps with line splitting and parsing.
+    Compressed streams can't seek, so only whole-file reads are supported.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)  # Compressed size
+        self.opener = OPENERS[os.path.splitext(path)[1].lower()]
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._stop.set()
+
+    def _blocks(self):
+        blocks = queue.Queue(maxsize=DECOMPRESS_AHEAD)
+        stop = threading.Event()
+        failure = []
+
+        def put(item):
+            while not (stop.is_set() or self._stop.is_set()):
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def decompress():
+            try:
+                with self.opener(self.path) as f:
+                    while True:
+                        block = f.read(DECOMPRESS_BLOCK)
+                        if not block or not put(block): break
+            except Exception as e:
+                failure.append(e)
+            finally:
+                put(None)
+
+        thread = threading.Thread(target=decompress, name="decompress", daemon=True)
+        thread.start()
+        try:
+            while True:
+                block = blocks.get()
+                if block is None: break
+                yield block
+        finally:
+            stop.set()  # Consumer stopped early: let the thread exit
+            thread.join()
+        if failure:
+            raise failure[0]
+
+    def iter_lines(self, start=0, end=None):
+        if start or end is not None:
+            raise ValueError(f"{self.path}: byte ranges need an uncompressed input")
+        pos, tail = 0, b''
+        for block in self._blocks():
+            data = tail + block if tail else block
+            i = 0
+            while True:
+                nl = data.find(b'\n', i)
+                if nl == -1: break
+                yield pos, data[i:nl + 1]
+                pos += nl + 1 - i
+                i = nl + 1
+            tail = data[i:]
+        if tail:
+            yield pos, tail
+
+    def count_lines(self, start=0, end=None):
+        """Counts lines with a decompress-only pass; cheap next to parsing them."""
+        if start or end is not None:
+            raise ValueError(f"{self.path}: byte ranges need an uncompressed input")
+        total, last = 0, b'\n'
+        for block in self._blocks():
+            total += block.count(b'\n')
+            last = block[-1:]
+        return total + (last != b'\n')
+
+    def split_ranges(self, parts):
+        return [(0, None)]  # Not splittable: one reader
+
+
+def open_jsonl(path):
+    """MappedJSONL for plain files, StreamedJSONL for .gz / .xz / .zst exports."""
+    if os.path.splitext(path)[1].lower() in OPENERS:
+        return StreamedJSONL(path)
+    return MappedJSONL(path)
+
+def expand_inputs(spec):
+    """
+    Input files for a path, directory or glob, in rank order (sorted by name).
+    A directory contributes its *.jsonl files, compressed or not.
+    """
+    if os.path.isdir(spec):
+        paths = [p for p in glob.glob(os.path.join(spec, '*'))
+                 if p.lower().endswith('.jsonl') or os.path.splitext(p)[0].lower().endswith('.jsonl')]
+    elif glob.has_magic(spec):
+        paths = glob.glob(spec)
+    else:
+        paths = [spec]
+    return sorted(p for p in paths if os.path.isfile(p))
+
+def iter_files(paths):
+    """Yields (file_index, line) across `paths` in order, one open file at a time."""
+    for index, path in enumerate(paths):
+        with open_jsonl(path) as reader:
+            for _, line in reader.iter_lines():
+                yield index, line
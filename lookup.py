@@ -0,0 +1,112 @@
+import argparse
+import random
+import time
+from config import DB_FILE, LOOKUP_BATCH
+from database import init_db, schema_mode, physical_table, view_expr
+from isbn import normalize_isbn13
+
+ITEM_COLUMNS = [('p', 'item_id'), ('p', 'biblio_id'), ('p', 'barcode'), ('p', 'call_number'),
+                ('p', 'library_code'), ('b', 'title')]
+BIBLIO_COLUMNS = [('b', 'biblio_id'), ('b', 'isbn13'), ('b', 'title'), ('b', 'author'), ('b', 'pub_year')]
+
+LOOKUPS = {
+    'barcode': """SELECT k.key, {columns} FROM temp.lookup_keys k
+                  LEFT JOIN {physical_items} p ON p.barcode = k.match
+                  LEFT JOIN {biblio_master} b ON b.biblio_id = p.biblio_id
+                  ORDER BY k.pos""",
+    'isbn': """SELECT k.key, {columns} FROM temp.lookup_keys k
+               LEFT JOIN {biblio_master} b ON b.isbn13 = k.match
+               ORDER BY k.pos""",
+}
+LOOKUP_COLUMNS = {'barcode': ITEM_COLUMNS, 'isbn': BIBLIO_COLUMNS}
+# Keys are joined in canonical form: "0-13-110362-8" finds isbn13 9780131103627
+MATCH_KEY = {'barcode': str.strip, 'isbn': normalize_isbn13}
+
+
+def chunks(keys, size):
+    chunk = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk: yield chunk
+
+def lookup_sql(kind, mode):
+    """
+    The batch join for this storage layout. It joins the data tables, not the
+    views: SQLite can't flatten the normalized views (they LEFT JOIN the lookup
+    tables) on the right of a LEFT JOIN, and would materialize the whole table
+    every batch. Lookup ids, dates and prices are decoded for matched rows only.
+    """
+    columns = ", ".join(f"{view_expr(col, mode, row)} AS {col}" for row, col in LOOKUP_COLUMNS[kind])
+    return LOOKUPS[kind].format(columns=columns, physical_items=physical_table('physical_items', mode),
+                                biblio_master=physical_table('biblio_master', mode))
+
+def batch_lookup(conn, kind, keys, batch=LOOKUP_BATCH):
+    """
+    Resolves many keys with one indexed join per batch instead of one query per
+    key. Yields (key, *columns) in input order; keys with no match come back
+    once with None columns, keys matching several rows once per row.
+    `keys` can be any iterable, so very large lists stream through in batches.
+    """
+    sql, match_key = lookup_sql(kind, schema_mode(conn)), MATCH_KEY[kind]
+    c = conn.cursor()
+    c.execute("DROP TABLE IF EXISTS temp.lookup_keys")
+    c.execute("CREATE TEMP TABLE lookup_keys (pos INTEGER PRIMARY KEY, key TEXT, match TEXT)")
+    for chunk in chunks(keys, batch):
+        c.execute("DELETE FROM temp.lookup_keys")
+        c.executemany("INSERT INTO temp.lookup_keys (key, match) VALUES (?, ?)",
+                      ((str(k).strip(), match_key(str(k))) for k in chunk))
+        rows = c.execute(sql)
+        while True:
+            part = rows.fetchmany(10000)
+            if not part: break
+            yield from part
+    conn.commit()
+
+def lookup_barcodes(conn, barcodes, batch=LOOKUP_BATCH):
+    return batch_lookup(conn, 'barcode', barcodes, batch)
+
+def lookup_isbns(conn, isbns, batch=LOOKUP_BATCH):
+    return batch_lookup(conn, 'isbn', isbns, batch)
+
+
+def benchmark(conn, sizes=(10000, 100000)):
+    """Batch join vs one query per key, on random existing barcodes (with repeats)."""
+    barcodes = [r[0] for r in conn.execute("SELECT barcode FROM physical_items WHERE barcode IS NOT NULL")]
+    if not barcodes:
+        print("No barcodes to benchmark against.")
+        return
+    single = lookup_sql('barcode', schema_mode(conn)).replace("temp.lookup_keys k", "(SELECT ? AS key, ? AS match) k").replace("ORDER BY k.pos", "")
+    print(f"{'keys':>8}{'batch keys/s':>16}{'per-key keys/s':>16}")
+    for size in sizes:
+        keys = [random.choice(barcodes) for _ in range(size)]
+        t0 = time.perf_counter()
+        for _ in batch_lookup(conn, 'barcode', keys): pass
+        batch_rate = size / (time.perf_counter() - t0)
+        sample = keys[:min(size, 10000)]  # Per-key is slow; time a slice
+        t0 = time.perf_counter()
+        for key in sample:
+            conn.execute(single, (key, key)).fetchall()
+        single_rate = len(sample) / (time.perf_counter() - t0)
+        print(f"{size:>8}{batch_rate:>16,.0f}{single_rate:>16,.0f}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Resolve a file of barcodes or ISBNs in batches.")
+    ap.add_argument('kind', choices=sorted(LOOKUPS))
+    ap.add_argument('keys_file', nargs='?', help="One key per line")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--batch', type=int, default=LOOKUP_BATCH)
+    ap.add_argument('--bench', action='store_true', help="Time 10k and 100k key batches instead")
+    args = ap.parse_args()
+
+    conn = init_db(args.db)
+    if args.bench:
+        benchmark(conn)
+    elif args.keys_file:
+        with open(args.keys_file, encoding='utf-8') as f:
+            keys = (line.strip() for line in f if line.strip())
+            for row in batch_lookup(conn, args.kind, keys, args.batch):
+                print("\t".join("" if v is None else str(v) for v in row))
+    conn.close()
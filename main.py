@@ -1,9 +1,20 @@
-import json
-import sqlite3
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tqdm import tqdm
-from config import INPUT_FILE
-from database import init_db
+from config import INPUT_FILE, DB_FILE, REPORT_FILE, PARSE_CACHE_DIR, PARSE_WORKERS
+from callnumber import call_number_key
+from database import init_db, BatchWriter, save_ingest_state
+from isbn import normalize_isbn13
+from jsonl_reader import MappedJSONL, open_jsonl, expand_inputs, iter_files, loads
+from parse_cache import cache_file, CacheWriter, load_cache
+from pipeline import run_pipeline
+from profiler import DatasetProfiler
 from smart_parser import IntelligentParser
+from summary import drop_summary_triggers, rebuild_summaries
 from publisher_parser import AI_PublisherParser
 
 # Initialize AI Parser
@@ -13,88 +24,251 @@ def get_language(rec):
     f008 = rec.get('008', '')
     return f008[35:38].strip() if len(f008) >= 38 else None
 
-def count_total_lines(filepath):
+def count_total_lines(filepath, start=0, end=None):
     print("Calculating dataset size...")
-    with open(filepath, 'rb') as f:
-        return sum(1 for _ in f)
+    with open_jsonl(filepath) as reader:
+        return reader.count_lines(start, end)
 
-def run_migration():
-    total_records = count_total_lines(INPUT_FILE)
+def count_file_lines(paths):
+    """Line count of each input; files are counted concurrently (mmap / decompression release the GIL)."""
+    print(f"Calculating dataset size ({len(paths)} files)...")
+    def count(path):
+        with open_jsonl(path) as reader:
+            return reader.count_lines()
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as pool:
+        return list(pool.map(count, paths))
+
+class FileProgress:
+    """
+    Overall bar plus a bar for the file being written. The writer consumes
+    lines in input order, so a running line count maps onto file boundaries.
+    """
+    def __init__(self, paths, counts):
+        self.paths, self.counts = paths, counts
+        self.index, self.done_in_file = 0, 0
+        self.overall = tqdm(total=sum(counts), desc="Overall", unit="rec", colour="green", position=0)
+        self.file_bar = None
+        self._open_file_bar()
+
+    def _open_file_bar(self):
+        while self.index < len(self.paths) and self.counts[self.index] == 0:
+            self.index += 1  # Empty files
+        if self.index < len(self.paths):
+            name = os.path.basename(self.paths[self.index])
+            self.file_bar = tqdm(total=self.counts[self.index], desc=f"[{self.index + 1}/{len(self.paths)}] {name}",
+                                 unit="rec", position=1, leave=False)
+
+    def update(self, n):
+        self.overall.update(n)
+        while n > 0 and self.file_bar is not None:
+            step = min(n, self.counts[self.index] - self.done_in_file)
+            self.file_bar.update(step)
+            self.done_in_file += step
+            n -= step
+            if self.done_in_file >= self.counts[self.index]:
+                self.file_bar.close()
+                self.overall.write(f"  {self.paths[self.index]}: {self.counts[self.index]} records")
+                self.index, self.done_in_file, self.file_bar = self.index + 1, 0, None
+                self._open_file_bar()
+
+    def close(self):
+        if self.file_bar is not None: self.file_bar.close()
+        self.overall.close()
+
+def parse_publication(rec):
+    """(pub_place, pub_publisher, pub_year) from the 260 field."""
+    # --- AI PUBLICATION PARSING ---
+    return pub_ai.parse(rec.get('260', ''))
+
+def parse_holdings(rec, b_id):
+    """Item row (ITEM_INSERT_COLUMNS order) from the 952 field, or None without one."""
+    raw_952 = rec.get('952', '')
+    if not raw_952: return None
+    parser = IntelligentParser(raw_952, item_type_hint=rec.get('942', ''))
+    item = parser.parse()
+    
+    return (
+        b_id, item['barcode'], item['call_number'],
+        item['shelving_location'], item['library_code'],
+        item['vendor'], item['bill_number'],
+        item['price'], item['currency'],
+        item['bill_date'], item['date_acquired'], item['last_seen_date'],
+        item['status_flags'][0], item['status_flags'][1], 
+        item['status_flags'][2], item['status_flags'][3],
+        call_number_key(item['call_number'])
+    )
+
+def parse_record(rec, line):
+    """Parses one decoded record into (biblio_row, item_row); item_row is None without 952."""
+    b_id = int(rec.get('id', 0))
+    place, publisher, year = parse_publication(rec)
+
+    # --- BIBLIO DATA ---
+    isbn = rec.get('020', '').strip()
+    biblio = (
+        b_id, 
+        rec.get('245', 'Untitled'), 
+        rec.get('100', None),
+        rec.get('250', None), 
+        isbn, 
+        place, publisher, year,
+        None, 
+        get_language(rec), 
+        rec.get('942', '').split()[0],
+        str(line, 'utf-8'),
+        normalize_isbn13(isbn)
+    )
+
+    # --- ITEM PARSING ---
+    return biblio, parse_holdings(rec, b_id)
+
+def parse_chunk(lines, profile=False):
+    """
+    Parser-worker entry point: bad records are skipped, as in the serial loop.
+    Returns (rows, side) where `side` carries the chunk's publication-parser
+    path counts and, with `profile`, a DatasetProfiler for merging.
+    """
+    rows = []
+    profiler = DatasetProfiler() if profile else None
+    for line in lines:
+        try:
+            rec = loads(line)
+        except Exception as e:
+            if profiler: profiler.bad_line(line)
+            continue
+        if profiler: profiler.update(rec)
+        try:
+            rows.append(parse_record(rec, line))
+        except Exception as e:
+            pass
+    return rows, {'pub_paths': pub_ai.take_stats(), 'profile': profiler}
+
+def ingest_position(path):
+    """
+    (offset, inode) of a plain input file for watch.py to resume after; None for
+    compressed ones. The offset is the end of the last complete line: a line the
+    scraper is still writing is left to watch.py whole.
+    """
+    with open_jsonl(path) as reader:
+        return (reader.complete_size(), os.stat(path).st_ino) if isinstance(reader, MappedJSONL) else None
+
+def record_ingest(db_file, path, ingested):
+    # watch.py picks up appends from where this run stopped
+    conn = init_db(db_file)
+    save_ingest_state(conn, os.path.abspath(path), *ingested)
+    conn.commit()
+    conn.close()
+
+def run_migration(start=0, end=None, profile=False, normalized=None, compact=None, input_file=INPUT_FILE,
+                  cache_dir=None, db_file=DB_FILE, workers=PARSE_WORKERS):
+    """
+    Migrates `input_file` (plain, .gz, .xz or .zst), or only the records starting inside
+    the byte range [start, end) of a plain file. `input_file` may also be a directory
+    or glob: its files are read in name order through one pipeline, so every file's
+    chunks share the parser pool, and on a biblio_id conflict the later file wins.
+    With `profile`, the dataset report is built from the same pass and written to REPORT_FILE.
+    `normalized` / `compact` choose the storage layout of a new `db_file` (see init_db).
+    With `cache_dir`, the parsed rows of a whole-input run are also saved there
+    (parse_cache.py); when a cache for the same inputs and parser already exists,
+    it is loaded instead and parsing is skipped.
+    """
+    paths = expand_inputs(input_file)
+    if not paths:
+        print(f"No input files match {input_file}")
+        return
+    if len(paths) > 1 and (start or end is not None):
+        raise ValueError("byte ranges apply to a single input file")
+    # Taken before reading, and the read stops there: the rest is left for watch.py
+    ingested = ingest_position(paths[0]) if len(paths) == 1 and end is None else None
+    stop = ingested[0] if ingested else end
+    if ingested and os.path.getsize(paths[0]) > stop:
+        print(f"{paths[0]} doesn't end with a newline: its last line is left for watch.py to finish")
+    cache = None
+    if cache_dir and not start and end is None:
+        print("Hashing inputs for the parse cache...")
+        cache = cache_file(paths, cache_dir)
+        if os.path.exists(cache) and os.path.exists(db_file):
+            # Loading replays whole rows, so it only builds new databases
+            print(f"{db_file} already exists: parsing into it instead of loading {cache}")
+            cache = None
+        elif os.path.exists(cache) and not profile:
+            print(f"Inputs already parsed by this parser version: loading {cache}")
+            t0 = time.perf_counter()
+            rows, writer = load_cache(cache, db_file, normalized, compact)
+            if ingested: record_ingest(db_file, paths[0], ingested)
+            print(f"\nLoaded {rows} records in {time.perf_counter() - t0:.2f}s")
+            print("  SQLite   " + writer.report())
+            return
+    if len(paths) == 1:
+        counts = [count_total_lines(paths[0], start, stop)]
+    else:
+        counts = count_file_lines(paths)
+    total_records = sum(counts)
     print(f"Starting M4-Optimized Migration V13 on {total_records} records...")
     
-    conn = init_db()
-    c = conn.cursor()
+    # Summaries are rebuilt in one pass afterwards, not row by row during the load
+    conn = init_db(db_file, normalized, compact)
+    drop_summary_triggers(conn)
+    conn.close()
+
+    # Writer owns its own connection, opened on the writer thread
+    writers = []
+    def make_writer():
+        writers.append(BatchWriter(init_db(db_file, normalized, compact)))
+        return CacheWriter(writers[0], cache) if cache else writers[0]
+    
+    report = DatasetProfiler() if profile else None
+    pub_paths = Counter()
+    def collect(side):
+        pub_paths.update(side['pub_paths'])
+        if report: report.merge(side['profile'])
     
-    batch_biblio = []
-    batch_items = []
     
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        # Using tqdm for the progress bar
-        for line in tqdm(f, total=total_records, desc="Processing", unit="rec", colour="green"):
-            try:
-                rec = json.loads(line)
-                b_id = int(rec.get('id', 0))
-                
-                # --- AI PUBLICATION PARSING ---
-                raw_pub = rec.get('260', '')
-                place, publisher, year = pub_ai.parse(raw_pub)
-
-                # --- BIBLIO DATA ---
-                batch_biblio.append((
-                    b_id, 
-                    rec.get('245', 'Untitled'), 
-                    rec.get('100', None),
-                    rec.get('250', None), 
-                    rec.get('020', '').strip(), 
-                    place, publisher, year,
-                    None, 
-                    get_language(rec), 
-                    rec.get('942', '').split()[0],
-                    line 
-                ))
-
-                # --- ITEM PARSING ---
-                raw_952 = rec.get('952', '')
-                if raw_952:
-                    parser = IntelligentParser(raw_952, item_type_hint=rec.get('942', ''))
-                    item = parser.parse()
-                    
-                    batch_items.append((
-                        b_id, item['barcode'], item['call_number'],
-                        item['shelving_location'], item['library_code'],
-                        item['vendor'], item['bill_number'],
-                        item['price'], item['currency'],
-                        item['bill_date'], item['date_acquired'], item['last_seen_date'],
-                        item['status_flags'][0], item['status_flags'][1], 
-                        item['status_flags'][2], item['status_flags'][3]
-                    ))
-
-                # --- BATCH COMMIT ---
-                if len(batch_biblio) >= 5000: # M4 can handle larger batches easily
-                    c.executemany("INSERT OR REPLACE INTO biblio_master VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", batch_biblio)
-                    c.executemany("""INSERT INTO physical_items 
-                        (biblio_id, barcode, call_number, shelving_location, library_code, vendor, bill_number, 
-                        price, currency, bill_date, date_acquired, last_seen_date, 
-                        is_withdrawn, is_lost, is_damaged, is_restricted) 
-                        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", batch_items)
-                    conn.commit()
-                    batch_biblio = []; batch_items = []
-
-            except Exception as e:
-                pass 
-
-    # Final Commit
-    if batch_biblio:
-        c.executemany("INSERT OR REPLACE INTO biblio_master VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", batch_biblio)
-        c.executemany("""INSERT INTO physical_items 
-            (biblio_id, barcode, call_number, shelving_location, library_code, vendor, bill_number, 
-            price, currency, bill_date, date_acquired, last_seen_date, 
-            is_withdrawn, is_lost, is_damaged, is_restricted) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", batch_items)
-        conn.commit()
+    if len(paths) == 1:
+        with open_jsonl(paths[0]) as reader:
+            # Using tqdm for the progress bar
+            with tqdm(total=total_records, desc="Processing", unit="rec", colour="green") as bar:
+                stats = run_pipeline(reader.iter_lines(start, stop), partial(parse_chunk, profile=profile),
+                                     make_writer, workers=workers, progress=bar, collect=collect)
+    else:
+        progress = FileProgress(paths, counts)
+        try:
+            stats = run_pipeline(iter_files(paths), partial(parse_chunk, profile=profile),
+                                 make_writer, workers=workers, progress=progress, collect=collect)
+        finally:
+            progress.close()
 
+    conn = init_db(db_file)
+    rebuild_summaries(conn)
     conn.close()
-    print("\nMigration Complete. Check library_fixed_v13.db")
+    if ingested: record_ingest(db_file, paths[0], ingested)
+
+    if report:
+        report.write_report(REPORT_FILE)
+        print(f"Dataset report written to {REPORT_FILE}")
+
+    print("\nPipeline stages:")
+    for stage in stats:
+        print("  " + stage.report())
+    print("  SQLite   " + writers[0].report())
+    if cache:
+        print(f"  Parsed rows cached in {cache}")
+    print("\nPublication parsing paths (260):")
+    for path in ('rule', 'gazetteer', 'ner', 'empty'):
+        print(f"  {path:<9} {pub_paths[path]}")
+    print(f"\nMigration Complete. Check {db_file}")
 
 if __name__ == "__main__":
-    run_migration()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Migrate the JSONL export into SQLite.")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE,
+                    help="JSONL export (optionally .gz / .xz / .zst), or a directory / glob of them")
+    ap.add_argument('--profile', action='store_true', help=f"Also regenerate {REPORT_FILE}")
+    ap.add_argument('--normalized', action='store_true', default=None,
+                    help="Create a new database with lookup tables for low-cardinality columns")
+    ap.add_argument('--compact', action='store_true', default=None,
+                    help="Create a new database with integer dates and prices")
+    ap.add_argument('--cache', nargs='?', const=PARSE_CACHE_DIR, metavar='DIR',
+                    help=f"Save parsed rows to DIR (default {PARSE_CACHE_DIR}), or load them if already there")
+    args = ap.parse_args()
+    run_migration(profile=args.profile, normalized=args.normalized, compact=args.compact,
+                  input_file=args.input, cache_dir=args.cache)
@@ -0,0 +1,202 @@
+import argparse
+import ast
+import hashlib
+import os
+import pickle
+import sys
+import time
+from tqdm import tqdm
+from config import (INPUT_FILE, DB_FILE, BASE_DIR, PATTERNS, RULE_CONFIDENCE, TYPO_FIXES_FILE,
+                    GAZETTEER_SEED_FILE, GAZETTEER_FILE, PARSE_CACHE_DIR, PARSER_VERSION, CACHE_FRAME_ROWS)
+from database import init_db, BatchWriter, BIBLIO_INSERT_COLUMNS, ITEM_INSERT_COLUMNS
+from jsonl_reader import expand_inputs
+from summary import drop_summary_triggers, rebuild_summaries
+
+CACHE_FORMAT = 1
+# Modules and data files that decide what a record parses to (besides PARSE_FUNCTIONS)
+PARSER_FILES = [os.path.join(BASE_DIR, name) for name in
+                ('smart_parser.py', 'publisher_parser.py', 'typo_fixer.py', 'gazetteer.py',
+                 'callnumber.py', 'isbn.py')] + [TYPO_FIXES_FILE, GAZETTEER_SEED_FILE, GAZETTEER_FILE]
+# The functions in main.py that build the cached rows
+PARSE_FUNCTIONS = ('get_language', 'parse_publication', 'parse_holdings', 'parse_record', 'parse_chunk')
+MAIN_FILE = os.path.join(BASE_DIR, 'main.py')
+
+
+def parse_sources(path=MAIN_FILE, names=PARSE_FUNCTIONS):
+    """Source of main.py's row-building functions, found with ast (main imports this module)."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    return [ast.get_source_segment(source, node) for node in ast.parse(source).body
+            if isinstance(node, ast.FunctionDef) and node.name in names]
+
+def parser_fingerprint():
+    """
+    Hash of what the parse stage depends on: PARSER_VERSION, the parser
+    modules and their data files, main.py's row-building functions, the
+    PATTERNS regexes and the row layouts. Editing any of them retires every
+    existing cache; schema and storage changes don't.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(repr((PARSER_VERSION, RULE_CONFIDENCE, BIBLIO_INSERT_COLUMNS, ITEM_INSERT_COLUMNS)).encode())
+    h.update(repr(sorted((k, getattr(v, 'pattern', v)) for k, v in PATTERNS.items())).encode())
+    for source in parse_sources():
+        h.update(source.encode())
+    for path in PARSER_FILES:
+        if os.path.exists(path):  # GAZETTEER_FILE only exists once learned
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def file_digest(path, block=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block)
+            if not data: break
+            h.update(data)
+    return h.hexdigest()
+
+def input_key(paths):
+    """Content hash of the input files in order (on a biblio_id conflict the later file wins)."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+def cache_file(paths, cache_dir=PARSE_CACHE_DIR):
+    return os.path.join(cache_dir, f"{input_key(paths)}.{parser_fingerprint()}.rows")
+
+def prune_stale(path):
+    """Removes caches of the same inputs written by other parser versions."""
+    folder, name = os.path.split(path)
+    key = name.split('.')[0]
+    for other in os.listdir(folder or '.'):
+        if other.startswith(key + '.') and other != name:
+            os.remove(os.path.join(folder, other))
+
+
+class CacheWriter:
+    """
+    Wraps the pipeline's sink: every parsed row still goes to `sink`, and is
+    also pickled into the cache, CACHE_FRAME_ROWS rows per frame, in input
+    order. The file is written under a temporary name and only renamed into
+    place by close(), so a failed run never leaves a partial cache behind.
+    """
+    def __init__(self, sink, path, frame_rows=CACHE_FRAME_ROWS):
+        self.sink, self.path, self.frame_rows = sink, path, frame_rows
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.tmp = path + '.tmp'
+        self.file = open(self.tmp, 'wb')
+        pickle.dump({'format': CACHE_FORMAT, 'parser': parser_fingerprint(), 'created': time.time()},
+                    self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.frame = []
+        self.rows = 0
+
+    def add(self, biblio_row, item_row=None):
+        self.sink.add(biblio_row, item_row)
+        self.frame.append((biblio_row, item_row))
+        if len(self.frame) >= self.frame_rows:
+            self.dump()
+
+    def dump(self):
+        pickle.dump(self.frame, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rows += len(self.frame)
+        self.frame = []
+
+    def report(self):
+        return self.sink.report()
+
+    def close(self):
+        if self.frame: self.dump()
+        self.file.close()
+        os.replace(self.tmp, self.path)
+        prune_stale(self.path)
+        self.sink.close()
+
+
+def read_frames(f):
+    """
+    Checks that an open cache file was written by this parser, then returns
+    an iterator over its row frames.
+    """
+    header = pickle.load(f)
+    if header.get('format') != CACHE_FORMAT or header.get('parser') != parser_fingerprint():
+        raise ValueError(f"{f.name} was written by another parser version")
+    def frames():
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+    return frames()
+
+def load_cache(path, db_file=DB_FILE, normalized=None, compact=None):
+    """
+    Rebuilds the database from a parse cache. Rows are replayed in their
+    original order through the migration's BatchWriter, so the result is
+    the same as a full run, in the storage layout chosen for the new database.
+    Replaying into an existing database would add every item a second time,
+    so `db_file` must not exist yet. Returns (rows, writer).
+    """
+    if os.path.exists(db_file):
+        raise ValueError(f"{db_file} already exists; a cache loads into a new database")
+    with open(path, 'rb') as f:
+        frames = read_frames(f)  # Refuse a stale cache before touching the database
+        conn = init_db(db_file, normalized, compact)
+        drop_summary_triggers(conn)
+        conn.close()
+
+        writer = BatchWriter(init_db(db_file))
+        rows = 0
+        with tqdm(total=os.path.getsize(path), desc="Loading", unit="B", unit_scale=True, colour="green") as bar:
+            for frame in frames:
+                for row in frame:
+                    writer.add(*row)
+                rows += len(frame)
+                bar.update(f.tell() - bar.n)
+    writer.close()
+
+    conn = init_db(db_file)
+    rebuild_summaries(conn)
+    conn.close()
+    return rows, writer
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild the database from cached parse results (see main.py --cache).")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE,
+                    help="The input the cache was built from (file, directory or glob), or a .rows cache file")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--cache-dir', default=PARSE_CACHE_DIR)
+    ap.add_argument('--normalized', action='store_true', default=None,
+                    help="Create a new database with lookup tables for low-cardinality columns")
+    ap.add_argument('--compact', action='store_true', default=None,
+                    help="Create a new database with integer dates and prices")
+    args = ap.parse_args()
+
+    if args.input.endswith('.rows'):
+        path = args.input
+    else:
+        paths = expand_inputs(args.input)
+        if not paths:
+            print(f"No input files match {args.input}")
+            sys.exit(1)
+        print(f"Hashing {len(paths)} input file(s)...")
+        path = cache_file(paths, args.cache_dir)
+    if not os.path.exists(path):
+        print(f"Error: no parse cache for {args.input} from the current parser ({path}).")
+        print(f"Please run: python main.py --cache {args.input}")
+        sys.exit(1)
+    if os.path.exists(args.db):
+        print(f"Error: {args.db} already exists; a cache loads into a new database.")
+        print(f"Please pass another --db, or remove {args.db} first")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    try:
+        rows, writer = load_cache(path, args.db, args.normalized, args.compact)
+    except ValueError as e:
+        print(f"Error: {e}.")
+        print("Please run: python main.py --cache <input>")
+        sys.exit(1)
+    print(f"Loaded {rows} records from {path} in {time.perf_counter() - t0:.2f}s")
+    print("  SQLite   " + writer.report())
@@ -0,0 +1,169 @@
+import argparse
+import glob
+import importlib.util
+import inspect
+import os
+import re
+import time
+from config import INPUT_FILE, BASE_DIR
+from jsonl_reader import open_jsonl, loads
+
+VERSION_DIR = os.path.join(BASE_DIR, 'Version Control')
+
+ITEM_FIELDS = ['barcode', 'call_number', 'shelving_location', 'library_code', 'vendor', 'bill_number',
+               'price', 'currency', 'bill_date', 'date_acquired', 'last_seen_date',
+               'is_withdrawn', 'is_lost', 'is_damaged', 'is_restricted']
+PUB_FIELDS = ['pub_place', 'pub_publisher', 'pub_year']
+FLAG_NAMES = ['is_withdrawn', 'is_lost', 'is_damaged', 'is_restricted']
+OLD_FLAG_NAMES = ['status_withdrawn', 'status_lost', 'status_damaged', 'status_not_for_loan']
+MISSING = object()  # Field the version doesn't produce at all
+
+
+def load_version(path):
+    """Imports a Version Control script as a module. Their migrations sit behind __main__."""
+    name = "vc_" + re.sub(r'\W+', '_', os.path.splitext(os.path.basename(path))[0])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def holdings_parser(module):
+    """Returns f(raw_952, item_type) -> dict or None, whatever the version's API was."""
+    if hasattr(module, 'SmartParser'):
+        cls = module.SmartParser
+        if 'item_type_hint' in inspect.signature(cls.__init__).parameters:
+            return lambda raw, hint: cls(raw, item_type_hint=hint).parse()
+        return lambda raw, hint: cls(raw).parse()
+    for name in ('parse_holdings_maximalist', 'parse_holdings_952'):
+        if hasattr(module, name):
+            fn = getattr(module, name)
+            return lambda raw, hint: fn(raw)
+    return None
+
+def publication_parser(module):
+    if hasattr(module, 'split_publication_info'):
+        return module.split_publication_info
+    if hasattr(module, 'extract_year'):
+        fn = module.extract_year
+        return lambda raw: (MISSING, MISSING, fn(raw))
+    return None
+
+def current_parsers():
+    """The live IntelligentParser / AI_PublisherParser, for comparison against history."""
+    from smart_parser import IntelligentParser
+    parsers = {'holdings': lambda raw, hint: IntelligentParser(raw, item_type_hint=hint).parse()}
+    try:
+        from publisher_parser import AI_PublisherParser
+        parsers['publication'] = AI_PublisherParser().parse
+    except ImportError:
+        print("spaCy not installed: skipping the current publication parser.")
+    return parsers
+
+def discover_versions():
+    versions = {}
+    for path in sorted(glob.glob(os.path.join(VERSION_DIR, '*.py'))):
+        module = load_version(path)
+        versions[os.path.basename(path)[:-3]] = {
+            'holdings': holdings_parser(module), 'publication': publication_parser(module)}
+    versions['current'] = current_parsers()
+    return versions
+
+
+def normalize_item(data):
+    if data is None: return None  # Version declined the string (empty / too short)
+    out = {}
+    for field in ITEM_FIELDS:
+        out[field] = data.get(field, MISSING)
+    if 'status_flags' in data:
+        out.update(zip(FLAG_NAMES, data['status_flags']))
+    for old, new in zip(OLD_FLAG_NAMES, FLAG_NAMES):
+        if old in data: out[new] = data[old]
+    for field, value in out.items():
+        if value is not MISSING and value is not None:
+            out[field] = str(value)[:10] if field.endswith('_date') else str(value)
+    return out
+
+def normalize_pub(result):
+    place, publisher, year = result if result else (None, None, None)
+    return {'pub_place': place, 'pub_publisher': publisher, 'pub_year': year}
+
+def load_sample(path=INPUT_FILE, limit=5000):
+    sample = []
+    with open_jsonl(path) as reader:
+        for _, line in reader.iter_lines():
+            try:
+                rec = loads(line)
+            except Exception:
+                continue
+            sample.append((rec.get('952', ''), rec.get('942', ''), rec.get('260', '')))
+            if len(sample) >= limit: break
+    return sample
+
+def run_version(parsers, sample):
+    """Runs one version over the sample; returns outputs, throughput and error counts."""
+    result = {'items': None, 'pubs': None, 'item_rate': None, 'pub_rate': None, 'errors': 0}
+    if parsers.get('holdings'):
+        fn, outputs = parsers['holdings'], []
+        t0 = time.perf_counter()
+        for raw_952, hint, _ in sample:
+            try: outputs.append(normalize_item(fn(raw_952, hint) if raw_952 else None))
+            except Exception: outputs.append(None); result['errors'] += 1
+        result['item_rate'] = len(sample) / (time.perf_counter() - t0)
+        result['items'] = outputs
+    if parsers.get('publication'):
+        fn, outputs = parsers['publication'], []
+        t0 = time.perf_counter()
+        for _, _, raw_260 in sample:
+            try: outputs.append(normalize_pub(fn(raw_260)))
+            except Exception: outputs.append(normalize_pub(None)); result['errors'] += 1
+        result['pub_rate'] = len(sample) / (time.perf_counter() - t0)
+        result['pubs'] = outputs
+    return result
+
+def disagreement(outputs, reference, fields):
+    """Share of records where each field differs from the reference version ('-' if not produced)."""
+    row = {}
+    produced = lambda outs: {f for o in outs if o for f, v in o.items() if v is not MISSING} if outs else set()
+    both = produced(outputs) & produced(reference)
+    value = lambda out, field: out[field] if out else None
+    for field in fields:
+        if field not in both:
+            row[field] = None
+            continue
+        diff = sum(1 for a, b in zip(outputs, reference) if value(a, field) != value(b, field))
+        row[field] = diff / len(outputs) if outputs else 0.0
+    return row
+
+def print_report(results, reference):
+    width = max(len(v) for v in results) + 2
+    print("\n--- THROUGHPUT (records/sec) ---")
+    print(f"{'version':<{width}}{'952 parse':>12}{'260 parse':>12}{'errors':>8}")
+    for version, r in results.items():
+        item = f"{r['item_rate']:,.0f}" if r['item_rate'] else '-'
+        pub = f"{r['pub_rate']:,.0f}" if r['pub_rate'] else '-'
+        print(f"{version:<{width}}{item:>12}{pub:>12}{r['errors']:>8}")
+
+    ref = results[reference]
+    for title, key, fields in (("952 FIELDS", 'items', ITEM_FIELDS), ("260 FIELDS", 'pubs', PUB_FIELDS)):
+        print(f"\n--- DISAGREEMENT vs {reference}: {title} (% of records) ---")
+        print(f"{'version':<{width}}" + "".join(f"{f[:10]:>11}" for f in fields))
+        for version, r in results.items():
+            if version == reference: continue
+            row = disagreement(r[key], ref[key], fields)
+            print(f"{version:<{width}}" + "".join(
+                f"{'-':>11}" if row[f] is None else f"{row[f]:>10.1%} " for f in fields))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark and diff every historical parser against the current one.")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE)
+    ap.add_argument('--samples', type=int, default=5000)
+    ap.add_argument('--reference', default='current', help="Version the others are diffed against")
+    args = ap.parse_args()
+
+    sample = load_sample(args.input, args.samples)
+    print(f"Loaded {len(sample)} sample records from {args.input}")
+    results = {}
+    for version, parsers in discover_versions().items():
+        print(f"Running {version}...")
+        results[version] = run_version(parsers, sample)
+    print_report(results, args.reference)
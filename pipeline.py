@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from config import READ_CHUNK, QUEUE_DEPTH, PARSE_WORKERS
+
+_DONE = object()
+
+
+def _timed_parse(parse_chunk, chunk):
+    t0 = time.perf_counter()
+    rows = parse_chunk(chunk)
+    return rows, time.perf_counter() - t0
+
+
+class StageStats:
+    """Per-stage counters: time spent working vs. stalled on a neighbouring queue."""
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.stall = 0.0  # reader: blocked on a full queue, writer: waiting on parse results
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.samples = 0
+
+    def sample_depth(self, depth):
+        self.depth_sum += depth
+        self.depth_max = max(self.depth_max, depth)
+        self.samples += 1
+
+    def report(self):
+        line = f"{self.name:<8} items={self.items:<9} busy={self.busy:8.2f}s stall={self.stall:8.2f}s"
+        if self.samples:
+            line += f" queue avg={self.depth_sum / self.samples:5.1f} max={self.depth_max}"
+        return line
+
+
+def run_pipeline(lines, parse_chunk, make_writer, workers=PARSE_WORKERS,
+                 chunk_size=READ_CHUNK, queue_depth=QUEUE_DEPTH, progress=None, collect=None):
+    """
+    Reader -> parser workers -> SQLite writer, linked by one bounded queue.
+
+    The reader thread packs `lines` into chunks and submits each to the parser
+    pool, queueing the pending future. The queue holds at most `queue_depth`
+    chunks, which is the backpressure: when the writer falls behind, the reader
+    blocks instead of buffering the whole file. The writer thread consumes
+    futures in submission order, so output order never depends on which worker
+    finished first.
+
+    `parse_chunk(list_of_bytes)` must be picklable when workers > 1 and returns
+    a list of row tuples. `make_writer()` is called on the writer thread and
+    must return an object with add(*row) and close(). With `collect`, parse_chunk
+    instead returns (rows, side_result) and collect(side_result) is called on the
+    writer thread, in order, for each chunk.
+    When the sink or a parse fails, the reader stops and queued chunks are
+    cancelled, so the error surfaces without parsing the rest of the input.
+    Returns the StageStats of each stage.
+    """
+    pending = queue.Queue(maxsize=queue_depth)
+    read_stats, parse_stats, write_stats = StageStats("reader"), StageStats("parser"), StageStats("writer")
+    errors = []
+    failed = threading.Event()
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=1)
+
+    def reader():
+        try:
+            chunk = []
+            t0 = time.perf_counter()
+            for _, line in lines:
+                chunk.append(bytes(line))  # memoryviews can't cross process boundaries
+                if len(chunk) >= chunk_size:
+                    if failed.is_set(): return
+                    submit(chunk, t0)
+                    chunk = []
+                    t0 = time.perf_counter()
+            if chunk and not failed.is_set():
+                submit(chunk, t0)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pending.put(_DONE)
+
+    def submit(chunk, t0):
+        future = executor.submit(_timed_parse, parse_chunk, chunk)
+        read_stats.items += len(chunk)
+        read_stats.sample_depth(pending.qsize())
+        t1 = time.perf_counter()
+        read_stats.busy += t1 - t0
+        pending.put((future, len(chunk)))
+        read_stats.stall += time.perf_counter() - t1
+
+    def drain():
+        # Keep draining so the reader never blocks forever on a full queue
+        while True:
+            job = pending.get()
+            if job is _DONE: return
+            job[0].cancel()
+
+    def writer():
+        try:
+            sink = make_writer()
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+            drain()
+            return
+        done = False
+        try:
+            while True:
+                write_stats.sample_depth(pending.qsize())
+                t0 = time.perf_counter()
+                job = pending.get()
+                if job is _DONE:
+                    done = True
+                    break
+                future, size = job
+                rows, elapsed = future.result()
+                if collect is not None:
+                    rows, side = rows
+                    collect(side)
+                t1 = time.perf_counter()
+                write_stats.stall += t1 - t0
+                parse_stats.busy += elapsed
+                parse_stats.items += size
+                for row in rows:
+                    sink.add(*row)
+                write_stats.items += len(rows)
+                write_stats.busy += time.perf_counter() - t1
+                if progress is not None: progress.update(size)
+            t0 = time.perf_counter()
+            sink.close()
+            write_stats.busy += time.perf_counter() - t0
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+            # A failing sink.close() comes after _DONE: nothing left to drain then
+            if not done: drain()
+
+    threads = [threading.Thread(target=reader, name="reader"), threading.Thread(target=writer, name="writer")]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    executor.shutdown(cancel_futures=bool(errors))
+    if errors:
+        raise errors[0]
+    return [read_stats, parse_stats, write_stats]
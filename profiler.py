@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from multiprocessing import Pool
+from config import INPUT_FILE, REPORT_FILE
+from jsonl_reader import open_jsonl, loads
+from publisher_parser import split_publication_rules
+
+FIELD_LABELS = {
+    '245': 'Title', '942': 'Koha Item Type', '260': 'Publication Info',
+    '952': 'Holdings/Barcode (Crucial)', '100': 'Author', '300': 'Physical Desc',
+    '650': 'Subject', '020': 'ISBN',
+}
+YEAR_PATTERN = re.compile(r'\b(19|20)\d{2}\b')
+
+
+def publisher_name(text):
+    """Publisher half of a 260 string, split the way the rule pass does it."""
+    return split_publication_rules(YEAR_PATTERN.sub('', text).strip(" ,.:;-"))[1]
+
+# Field -> (report label, value counted)
+DISTINCT_FIELDS = {'100': ('Author', str), '260': ('Publisher', publisher_name)}
+
+
+class HyperLogLog:
+    """Approximate distinct counter; 2**p one-byte registers, ~1.04/sqrt(2**p) error."""
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)  # Linear counting for small sets
+        return int(round(estimate))
+
+
+class DatasetProfiler:
+    """
+    Streaming profile of the raw export (field coverage, 942 types, 952 shapes,
+    publication decades). Everything is a Counter or an HLL, so profiles built
+    over separate shards combine exactly with merge().
+    """
+    def __init__(self):
+        self.total = 0
+        self.corrupt = 0
+        self.missing_title = 0
+        self.coverage = Counter()
+        self.item_types = Counter()
+        self.segments = Counter()
+        self.decades = Counter()
+        self.distinct = {field: HyperLogLog() for field in DISTINCT_FIELDS}
+
+    def update(self, rec):
+        if not isinstance(rec, dict):
+            self.corrupt += 1
+            return
+        self.total += 1
+        if '245' not in rec: self.missing_title += 1
+        self.coverage.update(k for k, v in rec.items() if v)
+
+        self.item_types[rec.get('942') or 'Missing'] += 1
+
+        raw_952 = rec.get('952')
+        self.segments[f"String with {len(str(raw_952).split())} segments" if raw_952 else 'Missing'] += 1
+
+        match = YEAR_PATTERN.search(rec.get('260') or '')
+        self.decades[f"{int(match.group(0)) // 10 * 10}s" if match else 'Year Not Found'] += 1
+
+        for field, hll in self.distinct.items():
+            value = rec.get(field)
+            if value: value = DISTINCT_FIELDS[field][1](str(value))
+            if value: hll.add(value.strip().upper())
+
+    def add_line(self, line):
+        try:
+            rec = loads(line)
+        except Exception:
+            self.bad_line(line)
+            return
+        self.update(rec)
+
+    def bad_line(self, line):
+        # Blank lines are not records, so they don't count as corrupt
+        if bytes(line).strip(): self.corrupt += 1
+
+    def merge(self, other):
+        self.total += other.total
+        self.corrupt += other.corrupt
+        self.missing_title += other.missing_title
+        self.coverage.update(other.coverage)
+        self.item_types.update(other.item_types)
+        self.segments.update(other.segments)
+        self.decades.update(other.decades)
+        for field, hll in self.distinct.items():
+            hll.merge(other.distinct[field])
+        return self
+
+    def report(self):
+        out = ["=== LIBRARY DATASET ANALYSIS REPORT ===",
+               f"Generated on: {datetime.now()}",
+               f"Total Records Scanned: {self.total}",
+               f"Corrupt JSON Lines: {self.corrupt}",
+               f"Records missing Title (245): {self.missing_title}",
+               "", "--- FIELD COVERAGE (Top 15) ---",
+               "(How many records actually have this data?)"]
+        for field, n in self.coverage.most_common(15):
+            out.append(f"{field} ({FIELD_LABELS.get(field, field)}): {n} ({n / self.total:.2%})")
+
+        out += ["", "--- ITEM TYPES (942) ---", "(Useful for categorizing Books, Journals, etc.)"]
+        out += [f"{t}: {n}" for t, n in self.item_types.most_common()]
+
+        out += ["", "--- HOLDINGS STRUCTURE (952) ---",
+                "(Crucial for inventory. If inconsistent, we need a complex parser.)"]
+        out += [f"{s}: {n}" for s, n in self.segments.most_common(10)]
+
+        out += ["", "--- PUBLICATION DECADES ---"]
+        decades = sorted(d for d in self.decades if d != 'Year Not Found')
+        out += [f"{d}: {self.decades[d]}" for d in decades]
+        out.append(f"Year Not Found: {self.decades['Year Not Found']}")
+
+        out += ["", "--- APPROXIMATE DISTINCT VALUES (HyperLogLog) ---"]
+        out += [f"{f} ({DISTINCT_FIELDS[f][0]}): ~{hll.count()}" for f, hll in self.distinct.items()]
+        return "\n".join(out) + "\n"
+
+    def write_report(self, path=REPORT_FILE):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report())
+
+
+def profile_range(args):
+    path, start, end = args
+    profiler = DatasetProfiler()
+    with open_jsonl(path) as reader:
+        for _, line in reader.iter_lines(start, end):
+            profiler.add_line(line)
+    return profiler
+
+def profile_file(path=INPUT_FILE, workers=1):
+    """Profiles `path` in one pass, split across `workers` byte-range shards."""
+    with open_jsonl(path) as reader:
+        ranges = reader.split_ranges(workers)
+    jobs = [(path, start, end) for start, end in ranges]
+    if workers > 1:
+        with Pool(workers) as pool:
+            parts = pool.map(profile_range, jobs)
+    else:
+        parts = [profile_range(job) for job in jobs]
+    result = DatasetProfiler()
+    for part in parts:
+        result.merge(part)
+    return result
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Single-pass dataset profile of a JSONL export.")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE)
+    ap.add_argument('--out', default=REPORT_FILE)
+    ap.add_argument('--workers', type=int, default=1)
+    args = ap.parse_args()
+    profile_file(args.input, args.workers).write_report(args.out)
+    print(f"Report written to {args.out}")
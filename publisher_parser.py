@@ -1,30 +1,76 @@
 import spacy
 import re
 import sys
+from collections import Counter
+from config import RULE_CONFIDENCE
+from gazetteer import Gazetteer
+from typo_fixer import TypoFixer
 
 # Load the efficient model (CPU Optimized)
 # The M4 chip runs this blazingly fast.
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Error: Model 'en_core_web_sm' not found.")
-    print("Please run: python -m spacy download en_core_web_sm")
-    sys.exit(1)
+# Loaded on first use: when the rules handle everything, we never pay for it.
+nlp = None
+
+def get_nlp():
+    global nlp
+    if nlp is None:
+        try:
+            nlp = spacy.load("en_core_web_sm")
+        except OSError:
+            print("Error: Model 'en_core_web_sm' not found.")
+            print("Please run: python -m spacy download en_core_web_sm")
+            sys.exit(1)
+    return nlp
+
+# Words that mark the publisher side, never a place
+PUBLISHER_WORDS = {"PRESS", "PUBLISHERS", "PUBLISHER", "PUBLISHING", "PUBLICATIONS", "BOOKS",
+                   "LTD", "PVT", "CO", "INC", "UNIVERSITY", "HOUSE", "&", "AND", "SONS",
+                   "INSTITUTE", "AKADEMI", "ACADEMY", "SOCIETY", "SABHA", "TRUST", "COUNCIL", "PRAKASHAN"}
+PLACE_SHAPE = re.compile(r"^[A-Za-z][A-Za-z .'-]*$")
+
+def looks_like_place(text):
+    words = text.upper().replace('.', ' ').split()
+    return (bool(PLACE_SHAPE.match(text)) and len(words) <= 3
+            and not any(w in PUBLISHER_WORDS for w in words))
+
+def split_publication_rules(text):
+    """
+    Splits a cleaned 260 string on the standard "Place : Publisher" punctuation,
+    the way split_publication_info did in the Version Control scripts, and scores
+    how far the split can be trusted. Returns (place, publisher, confidence).
+    """
+    if ':' in text:
+        place, publisher = (part.strip(" ,.;:") for part in text.split(':', 1))
+        if not publisher: return place or None, None, 0.3
+        if not place: return None, publisher, 0.85  # ": Publisher" after noise removal
+        if looks_like_place(place): return place, publisher, 0.95
+        return place, publisher, 0.5  # "London ; New York : Wiley" and friends
+    if ',' in text:
+        place, publisher = (part.strip(" ,.;:") for part in text.split(',', 1))
+        # "Place, Publisher" is common, but so is "Publisher, Place"
+        if publisher and looks_like_place(place): return place, publisher, 0.6
+        return None, None, 0.0
+    return None, text, 0.2
 
 class AI_PublisherParser:
-    def __init__(self):
+    def __init__(self, rule_confidence=RULE_CONFIDENCE):
         self.year_pattern = re.compile(r'\b(19|20)\d{2}\b')
         self.noise_pattern = re.compile(r'\b(NONE|NULL|X+|\|+)\b', re.IGNORECASE)
         
-        # Hardcoded fixes for common Indian data entry habits
-        self.typo_fixes = {
-            "NEWDELHI": "NEW DELHI",
-            "N.DELHI": "NEW DELHI",
-            "MADRAS": "CHENNAI",
-            "BOMBAY": "MUMBAI",
-            "CALCUTTA": "KOLKATA",
-            "BANGALORE": "BENGALURU"
-        }
+        # Fixes for common Indian data entry habits, loaded from TYPO_FIXES_FILE
+        # and compiled into a single regex
+        self.typo_fixer = TypoFixer()
+
+        # Rule splits at or above this confidence skip spaCy entirely
+        self.rule_confidence = rule_confidence
+        # Known places/publishers: a deterministic pass ahead of the NER model
+        self.gazetteer = Gazetteer.load()
+        self.stats = Counter()  # Which path each record took: rule / gazetteer / ner / empty
+
+    def take_stats(self):
+        """Returns the path counts since the last call and resets them."""
+        stats, self.stats = self.stats, Counter()
+        return stats
 
     def parse(self, text):
         if not text:
@@ -41,19 +87,29 @@ class AI_PublisherParser:
         clean_text = text.strip().strip(".,:;")
         clean_text = self.noise_pattern.sub("", clean_text)
         
-        # Typo correction
-        clean_text_upper = clean_text.upper()
-        for bad, good in self.typo_fixes.items():
-            if bad in clean_text_upper:
-                # Use regex to replace keeping case if possible, or just force fix
-                clean_text = re.sub(bad, good, clean_text, flags=re.IGNORECASE)
+        # Typo correction (one regex pass over the text)
+        clean_text = self.typo_fixer.fix(clean_text)
         
         clean_text = clean_text.strip(" ,.-")
         if not clean_text:
+            self.stats['empty'] += 1
             return None, None, year
 
-        # 3. AI ENTITY RECOGNITION (M4 CPU)
-        doc = nlp(clean_text)
+        # 3. RULE-BASED SPLIT (regex speed, handles the standard punctuation)
+        place, publisher, confidence = split_publication_rules(clean_text)
+        if confidence >= self.rule_confidence:
+            self.stats['rule'] += 1
+            return place, publisher, year
+
+        # 4. GAZETTEER (known Indian cities, states and publishers)
+        known = self.gazetteer.split(clean_text)
+        if known:
+            self.stats['gazetteer'] += 1
+            return known[0], known[1], year
+
+        # 5. AI ENTITY RECOGNITION (M4 CPU) for the ambiguous remainder
+        self.stats['ner'] += 1
+        doc = get_nlp()(clean_text)
         
         place = []
         publisher = []
@@ -64,7 +120,7 @@ class AI_PublisherParser:
             elif ent.label_ in ["ORG", "PERSON"]: # Organization
                 publisher.append(ent.text)
         
-        # 4. FALLBACK & CLEANUP
+        # 6. FALLBACK & CLEANUP
         final_place = ", ".join(place) if place else None
         final_pub = ", ".join(publisher) if publisher else None
         
@@ -0,0 +1,164 @@
+import argparse
+import sqlite3
+import time
+from functools import partial
+from tqdm import tqdm
+from config import DB_FILE, PARSE_WORKERS, REPARSE_BATCH
+from database import (init_db, schema_mode, physical_table, store_column, row_encoder, Interner,
+                      ITEM_INSERT_COLUMNS)
+from isbn import normalize_isbn13
+from jsonl_reader import loads
+from main import parse_publication, parse_holdings
+from pipeline import run_pipeline
+
+
+def reparse_holdings(rec, b_id):
+    row = parse_holdings(rec, b_id)
+    return row[1:] if row else None  # biblio_id is the key, not a parsed value
+
+def reparse_publication(rec, b_id):
+    return parse_publication(rec)
+
+def reparse_isbn(rec, b_id):
+    return (normalize_isbn13(rec.get('020', '').strip()),)
+
+# Parser -> (table it writes, columns it owns, f(rec, biblio_id) -> values or None)
+PARSERS = {
+    # IntelligentParser and PATTERNS
+    'holdings': ('physical_items', ITEM_INSERT_COLUMNS[1:], reparse_holdings),
+    # Rules, typo fixes, gazetteer and NER
+    'publication': ('biblio_master', ['pub_place', 'pub_publisher', 'pub_year'], reparse_publication),
+    'isbn': ('biblio_master', ['isbn13'], reparse_isbn),
+}
+# The row a record's values belong to. A record migrates to at most one item, but a
+# biblio_id imported twice keeps the older record's item too; raw_json_dump is the
+# later record, whose item is the newest.
+TARGET_ROW = {
+    'biblio_master': "biblio_id = ?",
+    'physical_items': "item_id = (SELECT MAX(item_id) FROM {table} WHERE biblio_id = ?)",
+}
+
+
+def source_lines(db_file, batch=REPARSE_BATCH):
+    """
+    Yields (biblio_id, raw_json_dump) in key order, one page of `batch` rows
+    per query. Each page is fetched in full, so the read never holds a lock
+    across the writer's commits.
+    """
+    conn = sqlite3.connect(db_file)
+    source = physical_table('biblio_master', schema_mode(conn))  # raw_json_dump is stored as-is
+    last = -2 ** 63
+    try:
+        while True:
+            page = conn.execute(f"SELECT biblio_id, raw_json_dump FROM {source} "
+                                f"WHERE biblio_id > ? AND raw_json_dump IS NOT NULL "
+                                f"ORDER BY biblio_id LIMIT ?", (last, batch)).fetchall()
+            if not page: return
+            for b_id, raw in page:
+                yield b_id, raw.encode('utf-8')
+            last = page[-1][0]
+    finally:
+        conn.close()
+
+def reparse_chunk(lines, parser, picks):
+    """Parser-worker entry point: ([chosen column values], biblio_id) per record; failures are skipped."""
+    parse = PARSERS[parser][2]
+    rows = []
+    for line in lines:
+        try:
+            rec = loads(line)
+            b_id = int(rec.get('id', 0))
+            values = parse(rec, b_id)
+        except Exception:
+            continue
+        if values is not None:
+            rows.append(([values[i] for i in picks], b_id))
+    return rows
+
+
+class ColumnUpdater:
+    """
+    Pipeline sink that UPDATEs only `columns` of `table` (see TARGET_ROW), one
+    executemany per `batch` rows and a commit each. Values are encoded to the
+    storage layout like BatchWriter does and written to the stored table.
+    Rows whose stored values already match are left untouched, so only the
+    records a parser change affects are written (and move summary.py's totals).
+    """
+    def __init__(self, conn, table, columns, batch=REPARSE_BATCH):
+        self.conn, self.batch = conn, batch
+        mode = schema_mode(conn)
+        self.encode = row_encoder(columns, mode, Interner(conn) if mode['normalized'] else None)
+        stored = [store_column(col, mode) for col in columns]
+        target = physical_table(table, mode)
+        self.sql = (f"UPDATE {target} SET {', '.join(f'{col} = ?' for col in stored)} "
+                    f"WHERE {TARGET_ROW[table].format(table=target)} "
+                    f"AND ({' OR '.join(f'{col} IS NOT ?' for col in stored)})")
+        self.rows = []
+        self.seen = 0
+        self.changed = 0
+
+    def add(self, values, b_id):
+        if self.encode: values = self.encode(values)
+        self.rows.append((*values, b_id, *values))
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.rows: return
+        c = self.conn.cursor()
+        c.executemany(self.sql, self.rows)
+        self.changed += c.rowcount  # Stored table, so trigger writes aren't counted
+        self.conn.commit()
+        self.seen += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+def reparse(parser, db_file=DB_FILE, columns=None, workers=PARSE_WORKERS, batch=REPARSE_BATCH):
+    """
+    Re-runs one parser over every record's raw_json_dump and rewrites just the
+    columns it owns (or the subset `columns`). Reading, parsing and writing are
+    pipelined as in a migration. Returns (ColumnUpdater, stage stats).
+    """
+    table, owned, _ = PARSERS[parser]
+    columns = list(columns or owned)
+    unknown = [col for col in columns if col not in owned]
+    if unknown:
+        raise ValueError(f"the {parser} parser doesn't produce {', '.join(unknown)}")
+    picks = [owned.index(col) for col in columns]
+
+    conn = init_db(db_file)
+    total = conn.execute("SELECT COUNT(*) FROM biblio_master WHERE raw_json_dump IS NOT NULL").fetchone()[0]
+    conn.close()
+
+    updaters = []
+    def make_writer():
+        updaters.append(ColumnUpdater(init_db(db_file), table, columns, batch))
+        return updaters[0]
+    with tqdm(total=total, desc=f"Re-parsing ({parser})", unit="rec", colour="green") as bar:
+        stats = run_pipeline(source_lines(db_file, batch), partial(reparse_chunk, parser=parser, picks=picks),
+                             make_writer, workers=workers, progress=bar)
+    return updaters[0], stats
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-run one parser over raw_json_dump and update only its columns.")
+    ap.add_argument('parser', choices=sorted(PARSERS))
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--only', nargs='+', metavar='COLUMN',
+                    help="Update just these of the parser's columns (e.g. to keep last_seen_date / is_lost "
+                         "stamped by inventory.py)")
+    ap.add_argument('--workers', type=int, default=PARSE_WORKERS)
+    ap.add_argument('--batch', type=int, default=REPARSE_BATCH)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        updater, stats = reparse(args.parser, args.db, args.only, args.workers, args.batch)
+    except ValueError as e:
+        ap.error(str(e))
+    print(f"\nRe-parsed {updater.seen} records: {updater.changed} rows changed "
+          f"in {time.perf_counter() - t0:.2f}s")
+    for stage in stats:
+        print("  " + stage.report())
@@ -0,0 +1,195 @@
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+import time
+from config import INPUT_FILE, DB_FILE, PARSE_WORKERS, SHARD_DIR
+from database import (init_db, schema_mode, physical_table, store_column, store_expr, TABLES, INDEXES,
+                      LOOKUP_COLUMNS, BIBLIO_INSERT_COLUMNS, ITEM_INSERT_COLUMNS)
+from jsonl_reader import MappedJSONL, open_jsonl
+from main import run_migration
+from summary import drop_summary_triggers, rebuild_summaries
+
+SHARD_NAME = re.compile(r'shard_(\d+)_of_(\d+)\.db$')
+# Per shard: biblios (later shards replace earlier ones), then their items
+MERGE_TABLES = [('biblio_master', BIBLIO_INSERT_COLUMNS, "INSERT OR REPLACE"),
+                ('physical_items', ITEM_INSERT_COLUMNS, "INSERT")]
+
+
+def shard_file(shard, shards, out_dir=SHARD_DIR):
+    # Zero-padded, so name order is shard order
+    return os.path.join(out_dir, f"shard_{shard:03d}_of_{shards:03d}.db")
+
+def shard_range(path, shard, shards):
+    """
+    Line-aligned byte range [start, end) of shard `shard` (0-based) of `shards`.
+    Depends only on the file, so every node computes the same split. A shard
+    may come out empty when the file has fewer lines than shards.
+    """
+    with open_jsonl(path) as reader:
+        if not isinstance(reader, MappedJSONL):
+            raise ValueError(f"{path}: byte-range shards need an uncompressed input")
+        bounds = [reader.align(reader.size * i // shards) for i in range(shards)] + [reader.size]
+    return bounds[shard], bounds[shard + 1]
+
+def run_shard(path, shard, shards, out_dir=SHARD_DIR, workers=PARSE_WORKERS, normalized=None, compact=None):
+    """
+    Migrates one shard into its own database. It is built under a temporary
+    name and renamed when complete, so merge never picks up a half-built shard
+    and a failed shard can simply be rerun.
+    """
+    start, end = shard_range(path, shard, shards)
+    out = shard_file(shard, shards, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = out + '.tmp'
+    if os.path.exists(tmp): os.remove(tmp)
+    print(f"Shard {shard + 1}/{shards}: bytes {start}..{end} of {path} -> {out}")
+    run_migration(start, end, normalized=normalized, compact=compact, input_file=path,
+                  db_file=tmp, workers=workers)
+    os.replace(tmp, out)
+    print(f"Shard {shard + 1}/{shards} written to {out}")
+    return out
+
+def run_local(path, shards, out_dir=SHARD_DIR, workers=PARSE_WORKERS, normalized=None, compact=None):
+    """
+    Runs every shard on this machine as a separate process, splitting the
+    parser workers between them; each shard's output goes to <shard db>.log.
+    Returns the shards that failed.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    flags = (['--normalized'] if normalized else []) + (['--compact'] if compact else [])
+    procs = []
+    for shard in range(shards):
+        log = open(shard_file(shard, shards, out_dir) + '.log', 'w')
+        cmd = [sys.executable, os.path.abspath(__file__), 'run', path, '--of', str(shards), '--shard', str(shard),
+               '--dir', out_dir, '--workers', str(max(1, workers // shards))] + flags
+        procs.append((shard, subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT), log))
+    failed = []
+    for shard, proc, log in procs:
+        proc.wait()
+        log.close()
+        status = "done" if proc.returncode == 0 else f"FAILED (exit {proc.returncode}, see {log.name})"
+        print(f"  shard {shard + 1}/{shards}: {status}")
+        if proc.returncode != 0: failed.append(shard)
+    return failed
+
+
+def shard_files(specs, out_dir=SHARD_DIR):
+    """
+    Shard databases in merge order: the given paths / globs, or every shard in
+    `out_dir`. When the names follow shard_file(), the set is checked to be
+    complete, since a missing shard would silently drop records.
+    """
+    files = []
+    for spec in specs or [os.path.join(out_dir, 'shard_*.db')]:
+        files.extend(sorted(glob.glob(spec)) if glob.has_magic(spec) else [spec])
+    named = [SHARD_NAME.search(os.path.basename(f)) for f in files]
+    if files and all(named):
+        totals = {int(m.group(2)) for m in named}
+        found = sorted(int(m.group(1)) for m in named)
+        if len(totals) != 1 or found != list(range(totals.pop())):
+            raise ValueError(f"incomplete or mixed shard set: {', '.join(files)}")
+        files = [f for _, f in sorted(zip(found, files))]
+    return files
+
+def merge_shards(out, files, normalized=None, compact=None):
+    """
+    Combines shard databases into a new database `out`, one ATTACH and one
+    INSERT ... SELECT per table per shard, in key order. Shards are applied in
+    order and a later shard's biblio replaces an earlier one's, like a later
+    line does in a single run; items keep their input order, so the result
+    matches migrating the whole file at once. Values are converted to the
+    output's storage layout in SQL, whatever layout the shards were built in.
+    Indexes and summaries are built once, after the last shard.
+    """
+    if os.path.exists(out):
+        raise ValueError(f"{out} already exists; merge builds a new database")
+    conn = init_db(out, normalized, compact)
+    mode = schema_mode(conn)
+    # Every shard is consistent on its own. Unindexed until the end, a replaced
+    # biblio's foreign-key check would scan all items.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    drop_summary_triggers(conn)
+    for name, _, _ in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+    main_biblio = physical_table('biblio_master', mode)
+    for n, path in enumerate(files, 1):
+        t0 = time.perf_counter()
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        # Read through the shard's own views, so its layout doesn't matter
+        conflicts = conn.execute(f"SELECT COUNT(*) FROM shard.biblio_master s WHERE EXISTS "
+                                 f"(SELECT 1 FROM main.{main_biblio} m WHERE m.biblio_id = s.biblio_id)").fetchone()[0]
+        counts = []
+        for table, columns, verb in MERGE_TABLES:
+            key = TABLES[table][0]
+            if mode['normalized']:
+                for col in columns:
+                    if col in LOOKUP_COLUMNS:
+                        conn.execute(f"INSERT OR IGNORE INTO main.lookup_{col}(value) "
+                                     f"SELECT DISTINCT {col} FROM shard.{table} WHERE {col} IS NOT NULL")
+            cur = conn.execute(f"{verb} INTO main.{physical_table(table, mode)} "
+                               f"({', '.join(store_column(col, mode) for col in columns)}) "
+                               f"SELECT {', '.join(store_expr(col, mode, 's') for col in columns)} "
+                               f"FROM shard.{table} s ORDER BY s.{key}")
+            counts.append(cur.rowcount)
+        conn.commit()
+        conn.execute("DETACH DATABASE shard")
+        print(f"  [{n}/{len(files)}] {path}: {counts[0]} biblios ({conflicts} replacing earlier shards), "
+              f"{counts[1]} items in {time.perf_counter() - t0:.2f}s")
+    conn.close()
+
+    t0 = time.perf_counter()
+    conn = init_db(out)  # Recreates the indexes
+    rebuild_summaries(conn)
+    conn.close()
+    print(f"  Indexes and summaries built in {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Migrate byte-range shards separately, then merge their databases.")
+    sub = ap.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help="Migrate one shard, or all of them as local processes")
+    run.add_argument('input', nargs='?', default=INPUT_FILE, help="Uncompressed JSONL export")
+    run.add_argument('--of', type=int, required=True, metavar='N', help="Number of shards")
+    run.add_argument('--shard', type=int, metavar='I', help="0-based shard to run here (default: all N locally)")
+    run.add_argument('--dir', default=SHARD_DIR, help="Where shard databases are written")
+    run.add_argument('--workers', type=int, default=PARSE_WORKERS,
+                     help="Parser processes (split across shards when all run locally)")
+    merge = sub.add_parser('merge', help="Merge shard databases into a new database")
+    merge.add_argument('shards', nargs='*', help="Shard databases in order (default: every shard in --dir)")
+    merge.add_argument('--db', default=DB_FILE)
+    merge.add_argument('--dir', default=SHARD_DIR)
+    for p in (run, merge):
+        p.add_argument('--normalized', action='store_true', default=None,
+                       help="Create new databases with lookup tables for low-cardinality columns")
+        p.add_argument('--compact', action='store_true', default=None,
+                       help="Create new databases with integer dates and prices")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        if args.command == 'run' and args.shard is not None:
+            if not 0 <= args.shard < args.of:
+                ap.error(f"--shard must be between 0 and {args.of - 1}")
+            run_shard(args.input, args.shard, args.of, args.dir, args.workers, args.normalized, args.compact)
+        elif args.command == 'run':
+            shard_range(args.input, 0, args.of)  # Fail fast on compressed inputs
+            print(f"Running {args.of} shards of {args.input} as local processes...")
+            failed = run_local(args.input, args.of, args.dir, args.workers, args.normalized, args.compact)
+            if failed:
+                print(f"Rerun the failed shards with: python shard.py run {args.input} --of {args.of} --shard I")
+                sys.exit(1)
+        else:
+            files = shard_files(args.shards, args.dir)
+            if not files:
+                print(f"No shard databases found in {args.dir}")
+                sys.exit(1)
+            print(f"Merging {len(files)} shards into {args.db}...")
+            merge_shards(args.db, files, args.normalized, args.compact)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
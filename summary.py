@@ -0,0 +1,136 @@
+import argparse
+import time
+from config import DB_FILE
+from database import init_db, schema_mode, physical_table, store_column, view_expr
+
+YEAR_OF = "IFNULL(CAST(substr({}, 1, 4) AS INTEGER), -1)"  # ISO date -> year, -1 if unknown
+
+# Each summary: (table, [(key, type)], [value], feeds). A feed is
+# (source table, columns it depends on, f(col) -> [key exprs], f(col) -> [value exprs]),
+# where col(name) gives the expression for a logical column of the source row.
+# The first feed also defines the full rebuild.
+SUMMARIES = [
+    ("summary_holdings_by_type", [("item_type", "TEXT")], ["holdings"], [
+        ("physical_items", ["biblio_id"],
+         lambda col: [f"IFNULL((SELECT item_type FROM biblio_master WHERE biblio_id = {col('biblio_id')}), '?')"],
+         lambda col: ["1"]),
+        # Re-typing a biblio moves its items between buckets
+        ("biblio_master", ["item_type"],
+         lambda col: [f"IFNULL({col('item_type')}, '?')"],
+         lambda col: [f"(SELECT COUNT(*) FROM physical_items WHERE biblio_id = {col('biblio_id')})"]),
+    ]),
+    ("summary_titles_by_decade", [("pub_decade", "INTEGER")], ["titles"], [
+        ("biblio_master", ["pub_year"],
+         lambda col: [f"IFNULL({col('pub_year')} / 10 * 10, -1)"],
+         lambda col: ["1"]),
+    ]),
+    ("summary_vendor_spend", [("vendor", "TEXT"), ("year", "INTEGER"), ("currency", "TEXT")],
+     ["items", "priced_items", "spend_minor"], [
+        ("physical_items", ["vendor", "bill_date", "date_acquired", "currency", "price"],
+         lambda col: [f"IFNULL({col('vendor')}, '?')",
+                      YEAR_OF.format(f"COALESCE({col('bill_date')}, {col('date_acquired')})"),
+                      f"IFNULL({col('currency')}, '?')"],
+         # Spend is kept in integer minor units so +/- updates never drift
+         lambda col: ["1", f"{col('price')} IS NOT NULL",
+                      f"IFNULL(CAST(round({col('price')} * 100) AS INTEGER), 0)"]),
+    ]),
+    ("summary_library_status", [("library_code", "TEXT")], ["items", "lost", "damaged"], [
+        ("physical_items", ["library_code", "is_lost", "is_damaged"],
+         lambda col: [f"IFNULL({col('library_code')}, '?')"],
+         lambda col: ["1", f"IFNULL({col('is_lost')}, 0)", f"IFNULL({col('is_damaged')}, 0)"]),
+    ]),
+]
+
+
+def create_tables(c):
+    for table, keys, values, _ in SUMMARIES:
+        cols = [f"{k} {t} NOT NULL" for k, t in keys] + [f"{v} INTEGER NOT NULL DEFAULT 0" for v in values]
+        c.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(cols)}, "
+                  f"PRIMARY KEY ({', '.join(k for k, _ in keys)}))")
+
+def upsert(table, keys, values, key_exprs, value_exprs, sign):
+    conflict = ", ".join(k for k, _ in keys)
+    return (f"INSERT INTO {table} ({conflict}, {', '.join(values)}) "
+            f"VALUES ({', '.join(key_exprs)}, {', '.join(f'{sign}({e})' for e in value_exprs)}) "
+            f"ON CONFLICT({conflict}) DO UPDATE SET "
+            + ", ".join(f"{v} = {v} + excluded.{v}" for v in values) + ";")
+
+def trigger_names(conn):
+    return [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'summary\\_%' ESCAPE '\\'")]
+
+def drop_summary_triggers(conn):
+    """Stops incremental upkeep, e.g. for a bulk load that is followed by rebuild_summaries()."""
+    for name in trigger_names(conn):
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.commit()
+
+def create_triggers(c, mode):
+    """
+    AFTER INSERT / DELETE / UPDATE triggers on the stored tables that move each
+    row's contribution in or out of the summaries. Updates that don't touch a
+    feed's columns (e.g. inventory stamping last_seen_date) leave it alone.
+    """
+    for table, keys, values, feeds in SUMMARIES:
+        for n, (source, columns, key_fn, value_fn) in enumerate(feeds):
+            target = physical_table(source, mode)
+            def stmt(row, sign):
+                col = lambda name: view_expr(name, mode, row)
+                return upsert(table, keys, values, key_fn(col), value_fn(col), sign)
+            changed = " OR ".join(f"OLD.{store_column(c_, mode)} IS NOT NEW.{store_column(c_, mode)}"
+                                  for c_ in columns)
+            name = f"{table}_{n}"
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_ins AFTER INSERT ON {target} "
+                      f"BEGIN {stmt('NEW', '+')} END")
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_del AFTER DELETE ON {target} "
+                      f"BEGIN {stmt('OLD', '-')} END")
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_upd AFTER UPDATE ON {target} WHEN {changed} "
+                      f"BEGIN {stmt('OLD', '-')} {stmt('NEW', '+')} END")
+
+def rebuild_summaries(conn):
+    """Recomputes every summary with one GROUP BY each, then (re)enables the triggers."""
+    c = conn.cursor()
+    create_tables(c)
+    for table, keys, values, feeds in SUMMARIES:
+        source, _, key_fn, value_fn = feeds[0]
+        col = lambda name: f"src.{name}"
+        key_exprs = key_fn(col)
+        c.execute(f"DELETE FROM {table}")
+        c.execute(f"INSERT INTO {table} ({', '.join(k for k, _ in keys)}, {', '.join(values)}) "
+                  f"SELECT {', '.join(key_exprs)}, {', '.join(f'SUM({e})' for e in value_fn(col))} "
+                  f"FROM {source} src GROUP BY {', '.join(key_exprs)}")
+    create_triggers(c, schema_mode(conn))
+    conn.commit()
+
+def print_dashboard(conn, top=20):
+    print("--- HOLDINGS BY ITEM TYPE ---")
+    for item_type, n in conn.execute("SELECT item_type, holdings FROM summary_holdings_by_type "
+                                     "WHERE holdings > 0 ORDER BY holdings DESC"):
+        print(f"{item_type}: {n}")
+    print("\n--- TITLES BY PUBLICATION DECADE ---")
+    for decade, n in conn.execute("SELECT pub_decade, titles FROM summary_titles_by_decade "
+                                  "WHERE titles > 0 ORDER BY pub_decade"):
+        print(f"{decade if decade >= 0 else 'Year Not Found'}: {n}")
+    print(f"\n--- SPEND BY VENDOR / YEAR (Top {top}) ---")
+    for vendor, year, currency, items, spend in conn.execute(
+            "SELECT vendor, year, currency, items, spend_minor FROM summary_vendor_spend "
+            "WHERE items > 0 ORDER BY spend_minor DESC LIMIT ?", (top,)):
+        print(f"{vendor} {year if year >= 0 else '?'}: {spend / 100:,.2f} {currency} ({items} items)")
+    print("\n--- LOST / DAMAGED BY LIBRARY ---")
+    for library, items, lost, damaged in conn.execute(
+            "SELECT library_code, items, lost, damaged FROM summary_library_status "
+            "WHERE items > 0 ORDER BY library_code"):
+        print(f"{library}: {lost} lost, {damaged} damaged of {items}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Dashboard summaries kept up to date by triggers.")
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--rebuild', action='store_true', help="Recompute from scratch and (re)create the triggers")
+    args = ap.parse_args()
+    conn = init_db(args.db)
+    if args.rebuild or not trigger_names(conn):
+        t0 = time.perf_counter()
+        rebuild_summaries(conn)
+        print(f"Summaries rebuilt in {time.perf_counter() - t0:.2f}s\n")
+    print_dashboard(conn)
+    conn.close()
@@ -0,0 +1,52 @@
+import re
+from config import TYPO_FIXES_FILE
+
+
+def load_typo_fixes(path=TYPO_FIXES_FILE):
+    """Reads BAD<TAB>GOOD lines; '#' starts a comment. Keys are matched case-insensitively."""
+    fixes = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'): continue
+            bad, good = line.split('\t', 1)
+            fixes[bad.strip().upper()] = good.strip()
+    return fixes
+
+def trie_pattern(words):
+    """
+    Builds one regex from a character trie of `words`, so shared prefixes are
+    tested once: the work per text position is bounded by the trie's fan-out
+    (at most the alphabet), not by the number of entries.
+    Optional suffixes are greedy, so the longest entry wins at each position.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = None  # End-of-word marker
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches: return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            body = '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class TypoFixer:
+    """Applies the whole typo table in a single regex pass over the text."""
+    def __init__(self, fixes=None):
+        self.fixes = load_typo_fixes() if fixes is None else {k.upper(): v for k, v in fixes.items()}
+        self.pattern = re.compile(trie_pattern(self.fixes), re.IGNORECASE) if self.fixes else None
+
+    def _replace(self, match):
+        return self.fixes[match.group(0).upper()]
+
+    def fix(self, text):
+        if self.pattern is None or not text: return text
+        return self.pattern.sub(self._replace, text)
@@ -0,0 +1,176 @@
+import argparse
+import os
+import time
+from config import INPUT_FILE, DB_FILE, WATCH_POLL_SECONDS, WATCH_COMMIT_SECONDS, WATCH_MAX_BATCH
+from database import init_db, BatchWriter, load_ingest_state, save_ingest_state
+from main import parse_chunk
+
+READ_LIMIT = 16 * 1024 * 1024  # Bytes read from the file per poll at most
+
+
+class Tail:
+    """
+    Follows an append-only file from a byte offset, handing out complete
+    lines only; a half-written last line waits for its newline.
+    Handles truncation (copytruncate: size drops below our offset -> restart
+    at 0) and rotation (the path now names a new inode -> finish the old
+    file, then start the new one at 0).
+    """
+    def __init__(self, path, offset=0, inode=None):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        if inode is not None and inode != self.inode:
+            print(f"{path} was replaced while we were stopped; starting it from the beginning")
+            offset = 0
+        self.offset = offset
+        self.events = []
+
+    def _read(self, max_lines, final=False):
+        self.file.seek(self.offset)
+        data = self.file.read(READ_LIMIT)
+        lines, pos = [], 0
+        while len(lines) < max_lines:
+            nl = data.find(b'\n', pos)
+            if nl == -1: break
+            lines.append(data[pos:nl + 1])
+            pos = nl + 1
+        if final and pos < len(data) and len(lines) < max_lines and len(data) < READ_LIMIT:
+            lines.append(data[pos:])  # Rotated away: its last line will never be finished
+            pos = len(data)
+        self.offset += pos
+        return lines
+
+    def read_lines(self, max_lines):
+        if os.fstat(self.file.fileno()).st_size < self.offset:
+            self.events.append("truncated")
+            self.offset = 0
+        lines = self._read(max_lines)
+        if lines: return lines
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return lines  # Mid-rotation: the new file isn't there yet
+        if current != self.inode:
+            lines = self._read(max_lines, final=True)
+            if lines: return lines
+            self.events.append("rotated")
+            self.file.close()
+            self.file = open(self.path, 'rb')
+            self.inode = os.fstat(self.file.fileno()).st_ino
+            self.offset = 0
+            lines = self._read(max_lines)
+        return lines
+
+    def close(self):
+        self.file.close()
+
+
+def commit_batch(conn, writer, tail, lines):
+    """
+    Parses and upserts one micro-batch. The rows, the replaced biblios' old
+    items and the new file offset go into the same transaction, so a crash
+    never skips or double-applies records.
+    """
+    rows, side = parse_chunk(lines)
+    biblio_ids = sorted({biblio[0] for biblio, _ in rows})
+    for i in range(0, len(biblio_ids), 500):
+        part = biblio_ids[i:i + 500]
+        conn.execute(f"DELETE FROM physical_items WHERE biblio_id IN ({','.join('?' * len(part))})", part)
+    for row in rows:
+        writer.add(*row)
+    save_ingest_state(conn, tail.path, tail.offset, tail.inode)
+    writer.flush()
+    conn.commit()  # flush() doesn't commit a batch with no rows (all blank or bad lines)
+    return len(rows)
+
+def db_inode(db_file):
+    try:
+        return os.stat(db_file).st_ino
+    except FileNotFoundError:
+        return None
+
+def connect(db_file, path, max_batch):
+    """
+    Opens the database and returns (conn, writer, db inode, offset, input inode).
+    The inode is the file we actually opened: stat'ed on both sides of the
+    connect, so a swap in between is retried rather than missed.
+    """
+    while True:
+        before = db_inode(db_file)
+        conn = init_db(db_file)
+        if before is not None and db_inode(db_file) == before: break
+        conn.close()
+    offset, inode = load_ingest_state(conn, path)
+    conn.commit()
+    # We decide when to commit, so the writer must never flush on its own
+    writer = BatchWriter(conn, batch_size=max_batch + 1, max_bytes=float('inf'))
+    return conn, writer, before, offset, inode
+
+def watch(path=INPUT_FILE, db_file=DB_FILE, poll=WATCH_POLL_SECONDS, commit_seconds=WATCH_COMMIT_SECONDS,
+          max_batch=WATCH_MAX_BATCH, once=False):
+    """
+    Tails `path` from its persisted offset and upserts new records in micro-
+    batches: a batch is committed once it holds `max_batch` lines or its
+    oldest line has waited `commit_seconds`. With `once`, stops when caught up.
+
+    When `db_file` is replaced (build.py's blue/green swap), commits made since
+    went into the old file: we reconnect and resume from the offset recorded in
+    the new database, so those records are read again and land in the new one.
+    """
+    path = os.path.abspath(path)
+    conn, writer, db_ino, offset, inode = connect(db_file, path, max_batch)
+    tail = Tail(path, offset, inode)
+    print(f"Watching {path} from byte {tail.offset} (commit every {commit_seconds}s or {max_batch} lines)")
+    pending, oldest, total = [], None, 0
+    try:
+        while True:
+            lines = tail.read_lines(max_batch - len(pending))
+            for event in tail.events:
+                print(f"{path} was {event}; reading from the start")
+            tail.events.clear()
+            if lines:
+                pending.extend(lines)
+                oldest = oldest or time.monotonic()
+            due = pending and (len(pending) >= max_batch or time.monotonic() - oldest >= commit_seconds
+                               or (once and not lines))
+            if due:
+                lag = time.monotonic() - oldest
+                n = commit_batch(conn, writer, tail, pending)
+                total += n
+                print(f"{time.strftime('%H:%M:%S')} upserted {n} records ({len(pending) - n} skipped), "
+                      f"oldest waited {lag:.2f}s, offset {tail.offset}")
+                pending, oldest = [], None
+            if not lines:
+                if once and not pending: break
+                time.sleep(poll)
+            if db_inode(db_file) != db_ino:
+                print(f"{db_file} was replaced; reconnecting")
+                conn.close()
+                tail.close()
+                conn, writer, db_ino, offset, inode = connect(db_file, path, max_batch)
+                tail = Tail(path, offset, inode)
+                print(f"Resuming {path} from byte {tail.offset} as recorded in the new database")
+                pending, oldest = [], None
+    except KeyboardInterrupt:
+        if pending:
+            # Interrupted mid-batch: drop its half-applied statements and buffered rows first
+            conn.rollback()
+            writer.batch_biblio = []; writer.batch_items = []; writer.batch_bytes = 0
+            total += commit_batch(conn, writer, tail, pending)
+    finally:
+        tail.close()
+        conn.close()
+    print(f"Stopped after {total} records.")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Tail an append-only JSONL export into the database.")
+    ap.add_argument('input', nargs='?', default=INPUT_FILE)
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--poll', type=float, default=WATCH_POLL_SECONDS, help="Seconds between checks when idle")
+    ap.add_argument('--commit-seconds', type=float, default=WATCH_COMMIT_SECONDS,
+                    help="Longest a new record waits before it is committed")
+    ap.add_argument('--max-batch', type=int, default=WATCH_MAX_BATCH)
+    ap.add_argument('--once', action='store_true', help="Exit once caught up instead of watching")
+    args = ap.parse_args()
+    watch(args.input, args.db, args.poll, args.commit_seconds, args.max_batch, args.once)